@@ -1,14 +1,173 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-import sys
-sys.path.append('..')  
-from src.config import DATABASE_URL
-
-# Create synchronous engine
-engine = create_engine(DATABASE_URL, echo=False)
+import itertools
+import threading
+import time
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.orm import sessionmaker, declarative_base
+from database.serialization import get_json_codec
+from src import config
 
 # Base class for models
 Base = declarative_base()
+
+# Engines, session factories and the JSON codec are built on first use, so
+# importing this module (or the services on top of it) reads no settings and
+# opens no connections.
+_lazy = {}
+_lazy_lock = threading.RLock()
+
+
+def _once(key, build):
+    """Return the object cached under `key`, building it on first use"""
+    try:
+        return _lazy[key]
+    except KeyError:
+        with _lazy_lock:
+            if key not in _lazy:
+                _lazy[key] = build()
+            return _lazy[key]
+
+
+def json_codec():
+    """JSON backend for JSON columns and the spill log (JSON_SERIALIZER)"""
+    return _once("json_codec", lambda: get_json_codec(config.JSON_SERIALIZER))
+
+
+def engine_options():
+    """Pool and JSON options shared by the primary and every replica"""
+    codec = json_codec()
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "json_serializer": codec.dumps,
+        "json_deserializer": codec.loads,
+    }
+
+
+def connect_args(url):
+    """Driver options: psycopg 3 uses server-side prepared statements for repeated queries"""
+    if make_url(url).get_driver_name() == "psycopg":
+        return {"prepare_threshold": config.DB_PREPARE_THRESHOLD}
+    return {}
+
+
+def pool_capacity():
+    """Most connections the primary engine opens at once (pool_size + max_overflow)"""
+    return config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+
+
+def _create_engine(url):
+    return create_engine(url, echo=False, connect_args=connect_args(url), **engine_options())
+
+
+def _create_primary():
+    if not config.DATABASE_URL:
+        raise ValueError("DATABASE_URL not found in .env file!")
+    return _create_engine(config.DATABASE_URL)
+
+
+def get_engine():
+    """The synchronous primary engine (all writes go here)"""
+    return _once("engine", _create_primary)
+
+
+def SessionLocal(**kwargs):
+    """Session on the primary (keyword arguments override the factory defaults)"""
+    factory = _once("sessionmaker", lambda: sessionmaker(autocommit=False, autoflush=False, bind=get_engine()))
+    return factory(**kwargs)
+
+
+# ============= Read replicas =============
+# Postgres replica lag: 0 when everything received has been replayed
+# (an idle primary would otherwise look like growing lag)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    """A read replica engine plus its cached health / lag state"""
+
+    def __init__(self, url):
+        self.engine = _create_engine(url)
+        self.name = self.engine.url.host or self.engine.url.database
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.check_interval = config.REPLICA_CHECK_INTERVAL
+        self.max_lag = config.REPLICA_MAX_LAG_SECONDS
+        self.lag = None
+        self.healthy = False
+        self.checked_at = 0.0
+
+    def check(self):
+        """Refresh lag/health (cached for REPLICA_CHECK_INTERVAL seconds)"""
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return
+        self.checked_at = now
+
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    self.lag = float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag = 0.0
+            self.healthy = self.lag <= self.max_lag
+        except Exception as e:
+            print(f"⚠️ Replica {self.name} unavailable: {e}")
+            self.lag = None
+            self.healthy = False
+
+
+def get_replicas():
+    """Replica engines from DATABASE_REPLICA_URLS"""
+    return _once("replicas", lambda: [Replica(url) for url in config.DATABASE_REPLICA_URLS])
+
+
+_replica_lock = threading.Lock()
+
+
+def ReadSessionLocal():
+    """
+    Session for read-only queries.
+
+    Round-robins over replicas that are reachable and within
+    REPLICA_MAX_LAG_SECONDS of the primary; falls back to the primary
+    when there are none.
+    """
+    replicas = get_replicas()
+    if not replicas:
+        return SessionLocal()
+
+    replica_cycle = _once("replica_cycle", lambda: itertools.cycle(replicas))
+    with _replica_lock:
+        for _ in range(len(replicas)):
+            replica = next(replica_cycle)
+            replica.check()
+            if replica.healthy:
+                return replica.sessionmaker()
+
+    return SessionLocal()
+
+
+def pool_status():
+    """Pool usage for the primary and each replica (for diagnostics)"""
+    def describe(eng):
+        pool = eng.pool
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+    return {
+        "primary": describe(get_engine()),
+        "replicas": [
+            {"name": r.name, "healthy": r.healthy, "lag": r.lag, **describe(r.engine)}
+            for r in get_replicas()
+        ],
+    }
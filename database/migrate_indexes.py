@@ -0,0 +1,50 @@
+from sqlalchemy import text
+from database.connection import get_engine
+from database.models import MESSAGE_STATISTICS
+
+# create_all never touches existing indexes, so databases created before the
+# switch to snowflake (message_id) range filters are migrated with this script.
+# CONCURRENTLY keeps the table writable while indexes build (Postgres only).
+CREATE_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guild_message ON messages (guild_id, message_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_channel_message ON messages (channel_id, message_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guild_channel_message ON messages (guild_id, channel_id, message_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_guild_author_message ON messages (guild_id, author_id, message_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_created_brin ON messages USING brin (created_at)",
+]
+
+# Extended planner statistics (see database/models.py), picked up by the ANALYZE below
+CREATE_STATISTICS = [
+    f"CREATE STATISTICS IF NOT EXISTS {name} (dependencies) ON {', '.join(columns)} FROM messages"
+    for name, columns in MESSAGE_STATISTICS.items()
+]
+
+# Old B-tree indexes, dropped only after their replacements exist
+DROP_INDEXES = [
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_messages_channel_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_messages_guild_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_messages_author_id",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_messages_created_at",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_guild_channel_created",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_guild_author_created",
+]
+
+
+def migrate_indexes():
+    """Replace the created_at B-tree indexes with message_id composites + BRIN, add planner statistics"""
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        print("⚠️ Index migration only applies to PostgreSQL - recreate other databases instead")
+        return
+
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in CREATE_INDEXES + CREATE_STATISTICS + DROP_INDEXES:
+            print(f"  {statement}")
+            conn.execute(text(statement))
+        conn.execute(text("ANALYZE messages"))
+    print("✅ Message indexes migrated")
+
+
+if __name__ == "__main__":
+    migrate_indexes()
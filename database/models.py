@@ -1,6 +1,6 @@
 
 
-from sqlalchemy import Column, BigInteger, String, Text, DateTime, Boolean, JSON, Index
+from sqlalchemy import Column, BigInteger, String, Text, DateTime, Boolean, JSON, Index, DDL, event
 from sqlalchemy.sql import func
 from database.connection import Base
 
@@ -8,12 +8,12 @@ class Message(Base):
     __tablename__ = "messages"
     
     message_id = Column(BigInteger, primary_key=True)
-    channel_id = Column(BigInteger, nullable=False, index=True)
-    guild_id = Column(BigInteger, nullable=False, index=True)
-    author_id = Column(BigInteger, nullable=False, index=True)
+    channel_id = Column(BigInteger, nullable=False)
+    guild_id = Column(BigInteger, nullable=False)
+    author_id = Column(BigInteger, nullable=False)
     author_name = Column(String(100), nullable=False)
     content = Column(Text, nullable=True)
-    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
     edited_at = Column(DateTime(timezone=True), nullable=True)
     deleted_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -31,13 +31,57 @@ class Message(Base):
     def __repr__(self):
         return f"<Message(message_id={self.message_id}) by {self.author_name}>"
 
-# Add composite indexes for common query patterns
-Index('idx_guild_channel_created', Message.guild_id, Message.channel_id, Message.created_at)
-Index('idx_guild_author_created', Message.guild_id, Message.author_id, Message.created_at)
-   
+# Add composite indexes for common query patterns.
+# message_id is a snowflake (creation time in its high bits), so date ranges are
+# filtered and ordered by message_id - no B-tree on created_at is needed.
+Index('idx_guild_message', Message.guild_id, Message.message_id)
+Index('idx_channel_message', Message.channel_id, Message.message_id)
+Index('idx_guild_channel_message', Message.guild_id, Message.channel_id, Message.message_id)
+Index('idx_guild_author_message', Message.guild_id, Message.author_id, Message.message_id)
+
+# Rows arrive in time order, so a BRIN index covers ad-hoc created_at scans
+# at a tiny fraction of a B-tree's size and insert cost (plain index elsewhere)
+Index('idx_messages_created_brin', Message.created_at, postgresql_using='brin')
+
+# channel_id and author_id each determine guild_id. Without dependency statistics
+# the planner treats guild + channel/author filters as independent, expects far
+# fewer matches than there are, and sorts whole bitmaps instead of walking an
+# index in message_id order (Postgres only).
+MESSAGE_STATISTICS = {
+    'stat_messages_guild_channel': ('guild_id', 'channel_id'),
+    'stat_messages_guild_author': ('guild_id', 'author_id'),
+}
+for _name, _columns in MESSAGE_STATISTICS.items():
+    event.listen(Message.__table__, 'after_create', DDL(
+        f"CREATE STATISTICS IF NOT EXISTS {_name} (dependencies) ON {', '.join(_columns)} FROM %(fullname)s"
+    ).execute_if(dialect='postgresql'))
 
 
+class SearchQuery(Base):
+    """Saved /list filters, so result buttons only need to carry a hash + cursor"""
+    __tablename__ = "search_queries"
 
+    query_hash = Column(String(16), primary_key=True)
+    guild_id = Column(BigInteger, nullable=False)
+    filters = Column(JSON, nullable=False)
+    summary = Column(Text, nullable=True)  # Filters summary shown on result pages
+    total = Column(BigInteger, default=0)  # Match count when the search was run
+    created_at = Column(DateTime(timezone=True), server_default=func.now())  # Last run, expiry starts here
+
+    def __repr__(self):
+        return f"<SearchQuery(query_hash={self.query_hash}) in {self.guild_id}>"
 
 
-   
+class BackfillCursor(Base):
+    """History backfill progress per channel/thread, committed with each written page"""
+    __tablename__ = "backfill_cursors"
+
+    channel_id = Column(BigInteger, primary_key=True)
+    guild_id = Column(BigInteger, nullable=False, index=True)
+    before_id = Column(BigInteger, nullable=True)  # Oldest message fetched so far (resume point)
+    completed = Column(Boolean, default=False)  # Reached the start of the channel
+    messages = Column(BigInteger, default=0)  # Messages fetched so far
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BackfillCursor(channel_id={self.channel_id}) before {self.before_id}>"
@@ -0,0 +1,132 @@
+import dataclasses
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+# Fast JSON backends are optional (pip install orjson / msgspec)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+
+# ============= Payload schemas =============
+# Typed snapshots of the JSON stored in Message columns. The fast backends
+# serialize dataclasses natively (no intermediate dicts); rows read back are
+# plain dicts/lists with the same keys. Embeds stay as Embed.to_dict() output:
+# it is open-ended, and cheaper to build than any attribute-based snapshot
+# (embed sections are proxies created on every access).
+
+@dataclass(slots=True)
+class ReactionData:
+    emoji: str
+    count: int
+    is_custom: bool
+
+
+@dataclass(slots=True)
+class AttachmentData:
+    id: int
+    filename: str
+    url: str
+
+
+# ============= Codecs =============
+# Module-level functions rather than closures: psycopg caches its JSON adapters
+# by function code and won't cache (and logs a warning for) closures.
+
+def _default(value):
+    """Fallback for types the stdlib encoder doesn't know"""
+    if dataclasses.is_dataclass(value):
+        # Shallow - the encoder calls back here for nested dataclasses
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+# Encoders/decoders are built once and reused for every call
+_msgspec_encoder = msgspec.json.Encoder(enc_hook=_default) if msgspec else None
+_msgspec_decoder = msgspec.json.Decoder() if msgspec else None
+
+
+def _msgspec_dumps(obj):
+    return _msgspec_encoder.encode(obj).decode("utf-8")
+
+
+def _msgspec_loads(data):
+    try:
+        return _msgspec_decoder.decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+_json_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=_default)
+
+
+class JSONCodec:
+    """
+    A JSON backend: ``dumps`` returns compact ``str`` (what SQLAlchemy and the
+    spill log expect), ``loads`` accepts ``str`` or ``bytes`` and raises
+    ``ValueError`` on malformed input, whatever the backend.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+        if name == "orjson":
+            self.dumps = _orjson_dumps
+            self.loads = orjson.loads
+
+        elif name == "msgspec":
+            self.dumps = _msgspec_dumps
+            self.loads = _msgspec_loads
+
+        elif name == "json":
+            self.dumps = _json_encoder.encode
+            self.loads = json.loads
+
+        else:
+            raise ValueError(f"Unknown JSON backend: {name}")
+
+    def __repr__(self):
+        return f"<JSONCodec {self.name}>"
+
+
+def available_backends():
+    """Backends importable in this environment, fastest first"""
+    installed = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    return [name for name in JSON_BACKENDS if installed[name]]
+
+
+def get_json_codec(name="auto"):
+    """
+    Pick a JSON backend.
+
+    Args:
+        name: "orjson", "msgspec", "json", or "auto" for the fastest installed one
+
+    Returns:
+        JSONCodec: The codec (falls back to stdlib json if the requested one is missing)
+    """
+    if name == "auto":
+        return JSONCodec(available_backends()[0])
+
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    if name not in available_backends():
+        print(f"⚠️ JSON backend {name} is not installed, using stdlib json")
+        return JSONCodec("json")
+    return JSONCodec(name)
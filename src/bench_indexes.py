@@ -0,0 +1,164 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import sys
+
+sys.path.append('.')
+from sqlalchemy import text
+from database.connection import get_engine
+from services.buffer_service import DISCORD_EPOCH_MS, SNOWFLAKE_TIMESTAMP_SHIFT, snowflake_from_datetime
+
+# Index layouts compared on identical scratch copies of the messages table.
+# "btree" is the previous created_at-based layout, "snowflake" mirrors database/models.py.
+INDEX_LAYOUTS = {
+    "btree": [
+        "CREATE INDEX ON {table} (channel_id)",
+        "CREATE INDEX ON {table} (guild_id)",
+        "CREATE INDEX ON {table} (author_id)",
+        "CREATE INDEX ON {table} (created_at)",
+        "CREATE INDEX ON {table} (guild_id, channel_id, created_at)",
+        "CREATE INDEX ON {table} (guild_id, author_id, created_at)",
+    ],
+    "snowflake": [
+        "CREATE INDEX ON {table} (guild_id, message_id)",
+        "CREATE INDEX ON {table} (channel_id, message_id)",
+        "CREATE INDEX ON {table} (guild_id, channel_id, message_id)",
+        "CREATE INDEX ON {table} (guild_id, author_id, message_id)",
+        "CREATE INDEX ON {table} USING brin (created_at)",
+    ],
+}
+
+# One-day window queries, as issued by /list with a date range
+RANGE_QUERIES = {
+    "btree": "SELECT message_id FROM {table} WHERE guild_id = :guild_id "
+             "AND created_at >= :start AND created_at <= :end ORDER BY created_at DESC LIMIT 5",
+    "snowflake": "SELECT message_id FROM {table} WHERE guild_id = :guild_id "
+                 "AND message_id >= :start_id AND message_id <= :end_id ORDER BY message_id DESC LIMIT 5",
+}
+
+INSERT_SQL = (
+    "INSERT INTO {table} (message_id, channel_id, guild_id, author_id, author_name, content, "
+    "created_at, is_pinned, has_attachments, has_embeds, reaction_count) VALUES "
+    "(:message_id, :channel_id, :guild_id, :author_id, :author_name, :content, "
+    ":created_at, false, false, false, 0)"
+)
+
+
+def generate_rows(count, guilds=20, channels_per_guild=10, authors=500, days=90, seed=0):
+    """Synthetic messages in arrival (snowflake) order spread over `days` days"""
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+    step_ms = days * 86400000 / count
+
+    for i in range(count):
+        created = start + timedelta(milliseconds=i * step_ms)
+        ms = int(created.timestamp() * 1000) - DISCORD_EPOCH_MS
+        guild = rng.randrange(guilds)
+        yield {
+            "message_id": ms * SNOWFLAKE_TIMESTAMP_SHIFT + (i % SNOWFLAKE_TIMESTAMP_SHIFT),
+            "guild_id": 1000 + guild,
+            "channel_id": 100000 + guild * channels_per_guild + rng.randrange(channels_per_guild),
+            "author_id": 5000000 + rng.randrange(authors),
+            "author_name": f"user{rng.randrange(authors)}",
+            "content": "x" * rng.randrange(20, 200),
+            "created_at": created,
+        }
+
+
+def index_sizes(conn, table):
+    """Size in bytes of every index on `table`, by index name"""
+    rows = conn.execute(text(
+        "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+        "FROM pg_index WHERE indrelid = CAST(:table AS regclass)"
+    ), {"table": table}).all()
+    return dict(rows)
+
+
+def run_layout(layout, rows, batch_size, keep):
+    table = f"bench_messages_{layout}"
+
+    with get_engine().begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"CREATE TABLE {table} (LIKE messages INCLUDING DEFAULTS)"))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (message_id)"))
+        for statement in INDEX_LAYOUTS[layout]:
+            conn.execute(text(statement.format(table=table)))
+
+    insert = text(INSERT_SQL.format(table=table))
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        with get_engine().begin() as conn:
+            conn.execute(insert, rows[i:i + batch_size])
+    insert_seconds = time.perf_counter() - started
+
+    with get_engine().begin() as conn:
+        conn.execute(text(f"ANALYZE {table}"))
+        sizes = index_sizes(conn, table)
+        table_bytes = conn.execute(text(f"SELECT pg_relation_size('{table}')")).scalar()
+
+        # Median of repeated one-day window lookups
+        day = rows[len(rows) // 2]["created_at"]
+        params = {
+            "guild_id": rows[len(rows) // 2]["guild_id"],
+            "start": day,
+            "end": day + timedelta(days=1),
+            "start_id": snowflake_from_datetime(day),
+            "end_id": snowflake_from_datetime(day + timedelta(days=1), high=True),
+        }
+        query = text(RANGE_QUERIES[layout].format(table=table))
+        timings = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            conn.execute(query, params).all()
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+
+        if not keep:
+            conn.execute(text(f"DROP TABLE {table}"))
+
+    return {
+        "insert_seconds": insert_seconds,
+        "rows_per_sec": len(rows) / insert_seconds if insert_seconds > 0 else 0.0,
+        "index_sizes": sizes,
+        "index_bytes": sum(sizes.values()),
+        "table_bytes": table_bytes,
+        "range_query_ms": timings[len(timings) // 2] * 1000,
+    }
+
+
+def print_results(results):
+    print("=" * 60)
+    print(" INDEX BENCHMARK")
+    for layout, r in results.items():
+        print("-" * 60)
+        print(f"   {layout}: {r['rows_per_sec']:.0f} rows/s insert ({r['insert_seconds']:.2f}s), "
+              f"1-day range query p50={r['range_query_ms']:.2f}ms")
+        print(f"   table {r['table_bytes'] / 1048576:.1f} MiB, indexes {r['index_bytes'] / 1048576:.1f} MiB")
+        for name, size in sorted(r["index_sizes"].items(), key=lambda item: -item[1]):
+            print(f"      {name:<48} {size / 1048576:8.2f} MiB")
+    if {"btree", "snowflake"} <= results.keys():
+        old, new = results["btree"], results["snowflake"]
+        print("-" * 60)
+        print(f"   snowflake vs btree: indexes {new['index_bytes'] / old['index_bytes']:.0%} of the size, "
+              f"inserts {new['rows_per_sec'] / old['rows_per_sec']:.2f}× as fast")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare index size and insert cost of the created_at B-tree and snowflake/BRIN index layouts"
+    )
+    parser.add_argument("--rows", type=int, default=200000, help="Synthetic messages to insert per layout")
+    parser.add_argument("--batch", type=int, default=1000, help="Rows per insert transaction")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench_messages_* tables afterwards")
+    args = parser.parse_args()
+
+    if get_engine().dialect.name != "postgresql":
+        sys.exit("The index benchmark needs PostgreSQL (BRIN and pg_relation_size)")
+
+    print(f"🧪 Inserting {args.rows} messages per layout in batches of {args.batch}...")
+    rows = list(generate_rows(args.rows))
+    results = {layout: run_layout(layout, rows, args.batch, args.keep) for layout in INDEX_LAYOUTS}
+    print_results(results)
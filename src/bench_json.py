@@ -0,0 +1,114 @@
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import sys
+
+import discord
+
+sys.path.append('.')
+from database.serialization import available_backends, get_json_codec
+from services.buffer_service import message_to_data, reactions_to_data
+
+
+def make_message(i):
+    """A message with a link embed, a rich embed, two attachments and three reactions"""
+    link = discord.Embed(
+        title=f"Release notes {i}",
+        url="https://example.com/releases",
+        description="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+        colour=0x5865F2,
+        timestamp=datetime.now(timezone.utc),
+    )
+    link.set_author(name="Example", url="https://example.com")
+    link.set_thumbnail(url="https://cdn.example.com/thumb.png")
+    rich = discord.Embed(title="Poll", description="Which day works?")
+    for day in ("Mon", "Tue", "Wed", "Thu"):
+        rich.add_field(name=day, value=f"{i % 7} votes", inline=True)
+    rich.set_footer(text="Ends in 2 days")
+
+    attachments = [
+        SimpleNamespace(id=10_000 + i * 2 + n, filename=f"image{n}.png", url=f"https://cdn.example.com/{i}/{n}.png")
+        for n in range(2)
+    ]
+    reactions = [
+        SimpleNamespace(emoji=emoji, count=count, is_custom_emoji=lambda: False)
+        for emoji, count in (("👍", 12), ("🎉", 4), ("❤️", 1))
+    ]
+    guild = SimpleNamespace(id=1)
+    return SimpleNamespace(
+        id=1_200_000_000_000_000_000 + i,
+        channel=SimpleNamespace(id=7),
+        guild=guild,
+        author=SimpleNamespace(id=42, bot=False),
+        content="Check the release notes! " * 4,
+        created_at=datetime.now(timezone.utc),
+        edited_at=None,
+        pinned=False,
+        attachments=attachments,
+        embeds=[link, rich],
+        reactions=reactions,
+        jump_url=f"https://discord.com/channels/1/7/{i}",
+    )
+
+
+def legacy_payload(message):
+    """raw_data / reactions_data as built before typed schemas (plain dicts)"""
+    data = message_to_data(message)
+    data["raw_data"]["attachments"] = [
+        {"id": a.id, "filename": a.filename, "url": a.url} for a in message.attachments
+    ]
+    reactions = [{"emoji": str(r.emoji), "count": r.count, "is_custom": r.is_custom_emoji()} for r in message.reactions]
+    return data["raw_data"], reactions
+
+
+def typed_payload(message):
+    return message_to_data(message)["raw_data"], reactions_to_data(message)[0]
+
+
+def bench(messages, build, dumps, loads):
+    """Per-message cost (µs) of building, serializing and parsing the JSON columns"""
+    started = time.perf_counter()
+    payloads = [build(m) for m in messages]
+    built = time.perf_counter()
+    encoded = [(dumps(raw), dumps(reactions)) for raw, reactions in payloads]
+    dumped = time.perf_counter()
+    for raw, reactions in encoded:
+        loads(raw)
+        loads(reactions)
+    loaded = time.perf_counter()
+
+    n = len(messages)
+    return {
+        "build_us": (built - started) / n * 1e6,
+        "dumps_us": (dumped - built) / n * 1e6,
+        "loads_us": (loaded - dumped) / n * 1e6,
+        "bytes": sum(len(raw) + len(reactions) for raw, reactions in encoded) / n,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON serialization cost per message across backends")
+    parser.add_argument("--messages", type=int, default=20000, help="Synthetic messages per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per backend (best is reported)")
+    args = parser.parse_args()
+
+    messages = [make_message(i) for i in range(args.messages)]
+
+    # Baseline: what SQLAlchemy did by default (json.dumps / json.loads on dicts)
+    cases = [("dicts + json (old)", legacy_payload, json.dumps, json.loads)]
+    for name in available_backends():
+        codec = get_json_codec(name)
+        cases.append((f"typed + {name}", typed_payload, codec.dumps, codec.loads))
+
+    print(f"🧪 {args.messages} messages, 2 embeds / 2 attachments / 3 reactions each")
+    print(f"   {'case':<22}{'build':>9}{'dumps':>9}{'loads':>9}{'total':>9}{'bytes':>8}")
+    for label, build, dumps, loads in cases:
+        best = min(
+            (bench(messages, build, dumps, loads) for _ in range(args.repeat)),
+            key=lambda r: r["build_us"] + r["dumps_us"] + r["loads_us"]
+        )
+        total = best["build_us"] + best["dumps_us"] + best["loads_us"]
+        print(f"   {label:<22}{best['build_us']:>7.1f}µs{best['dumps_us']:>7.1f}µs"
+              f"{best['loads_us']:>7.1f}µs{total:>7.1f}µs{best['bytes']:>8.0f}")
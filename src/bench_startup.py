@@ -0,0 +1,88 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+
+# What each entry point has to import before it can do any work
+TARGETS = {
+    "interpreter": "pass",
+    "library": "import services.buffer_service",
+    "bot": "import main",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def child_env(credentials):
+    env = dict(os.environ)
+    if not credentials:
+        # Imports must not need real settings
+        env.pop("DATABASE_URL", None)
+        env.pop("DISCORD_BOT_TOKEN", None)
+    return env
+
+
+def run_python(statement, env, *flags):
+    code = f"import sys; sys.path.insert(0, {SRC_DIR!r}); sys.path.append('.'); {statement}"
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=ROOT_DIR, env=env, check=True, capture_output=True, text=True
+    )
+
+
+def cold_start_ms(statement, env, runs):
+    """Wall time of fresh interpreters running `statement`, in ms"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run_python(statement, env)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def slowest_imports(statement, env, top):
+    """Packages by cumulative import time (-X importtime), in ms"""
+    stderr = run_python(statement, env, "-X", "importtime").stderr
+    own = set(re.findall(r"import (\w+)", statement))
+    packages = {}
+    for match in IMPORTTIME_LINE.finditer(stderr):
+        _, cumulative, _, name = match.groups()
+        root = name.split(".")[0]
+        if root not in own:
+            packages[root] = max(packages.get(root, 0), int(cumulative) / 1000)
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time of the bot and library import paths")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports listed per target")
+    parser.add_argument("--with-credentials", action="store_true",
+                        help="Keep DATABASE_URL / DISCORD_BOT_TOKEN in the environment")
+    args = parser.parse_args()
+
+    env = child_env(args.with_credentials)
+    print(f"🧪 {args.runs} cold starts per target"
+          f"{'' if args.with_credentials else ' (no DATABASE_URL / DISCORD_BOT_TOKEN)'}")
+
+    results = {name: cold_start_ms(statement, env, args.runs) for name, statement in TARGETS.items()}
+    interpreter = statistics.median(results["interpreter"])
+
+    print(f"   {'target':<14}{'median':>10}{'min':>10}{'imports':>10}")
+    for name, timings in results.items():
+        median = statistics.median(timings)
+        imports = f"{median - interpreter:>8.0f}ms" if name != "interpreter" else f"{'-':>10}"
+        print(f"   {name:<14}{median:>8.0f}ms{min(timings):>8.0f}ms{imports}")
+
+    for name, statement in TARGETS.items():
+        if name == "interpreter":
+            continue
+        print(f"   slowest imports ({name}): " + ", ".join(
+            f"{package} {ms:.0f}ms" for package, ms in slowest_imports(statement, env, args.top)
+        ))
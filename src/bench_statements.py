@@ -0,0 +1,174 @@
+import argparse
+import time
+from datetime import datetime, timezone
+import sys
+
+sys.path.append('.')
+from database.connection import SessionLocal, get_engine
+from config import DB_PREPARE_THRESHOLD
+from database.models import Message
+from services.buffer_service import (
+    SELECT_MESSAGE,
+    SELECT_CHANNEL_MESSAGE_IDS,
+    UPDATE_REACTIONS,
+    apply_write_ops,
+    statements_for,
+    bulk_delete_messages
+)
+
+# Far outside real snowflake ranges, so the benchmark never touches real rows
+BENCH_CHANNEL_ID = 1
+BENCH_GUILD_ID = 1
+BENCH_FIRST_ID = 1000
+
+
+def bench_row(message_id):
+    return {
+        "message_id": message_id,
+        "channel_id": BENCH_CHANNEL_ID,
+        "guild_id": BENCH_GUILD_ID,
+        "author_id": 1,
+        "author_name": "bench",
+        "content": "benchmark message",
+        "created_at": datetime.now(timezone.utc),
+        "edited_at": None,
+        "is_pinned": False,
+        "has_attachments": False,
+        "has_embeds": False,
+        "raw_data": None,
+    }
+
+
+# ===== Previous implementations (fresh ORM Query per call) =====
+
+def legacy_lookup(db, message_id):
+    return db.query(Message).filter(Message.message_id == message_id).first()
+
+
+def legacy_channel_ids(db, channel_id):
+    rows = db.query(Message.message_id).filter(
+        Message.channel_id == channel_id
+    ).order_by(Message.message_id.desc()).limit(100).all()
+    return {r.message_id for r in rows}
+
+
+def legacy_reactions(db, message_id):
+    message = db.query(Message).filter(Message.message_id == message_id).first()
+    message.reactions_data = [{"emoji": "👍", "count": 1, "is_custom": False}]
+    message.reaction_count = 1
+    db.commit()
+
+
+def legacy_bulk_delete(db, message_ids):
+    db.query(Message).filter(Message.message_id.in_(message_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def legacy_save_batch(db, rows):
+    # One existence lookup + ORM insert per op, as apply_write_ops used to do
+    for row in rows:
+        exists = db.query(Message.message_id).filter(Message.message_id == row["message_id"]).first()
+        if not exists:
+            db.add(Message(**row, reaction_count=0))
+    db.commit()
+
+
+# ===== Cached statements =====
+
+def cached_lookup(db, message_id):
+    return db.scalars(SELECT_MESSAGE, {"message_id": message_id}).first()
+
+
+def cached_channel_ids(db, channel_id):
+    return set(db.scalars(SELECT_CHANNEL_MESSAGE_IDS, {"channel_id": channel_id, "limit": 100}))
+
+
+def cached_reactions(db, message_id):
+    db.execute(UPDATE_REACTIONS, {
+        "b_message_id": message_id,
+        "b_reactions_data": [{"emoji": "👍", "count": 1, "is_custom": False}],
+        "b_reaction_count": 1,
+    })
+    db.commit()
+
+
+def cached_bulk_delete(db, message_ids):
+    db.execute(statements_for(db)["delete"], {"message_ids": message_ids})
+    db.commit()
+
+
+def time_calls(fn, iterations, make_args):
+    """Mean µs per call, one session per call like the real functions"""
+    started = time.perf_counter()
+    for i in range(iterations):
+        db = SessionLocal()
+        try:
+            fn(db, *make_args(i))
+        finally:
+            db.close()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_benchmark(iterations, batch_size):
+    engine = get_engine()
+    print(f"🧪 {engine.dialect.name} ({engine.driver}), prepare_threshold={DB_PREPARE_THRESHOLD}, "
+          f"{iterations} calls per statement")
+
+    seeded = [bench_row(BENCH_FIRST_ID + i) for i in range(200)]
+    apply_write_ops([["save_many", seeded]])
+    ids = [row["message_id"] for row in seeded]
+    missing = [BENCH_FIRST_ID - 1 - i for i in range(10)]
+    next_id = BENCH_FIRST_ID + len(seeded)
+
+    cases = [
+        ("lookup by message_id", legacy_lookup, cached_lookup, lambda i: (ids[i % len(ids)],)),
+        ("channel ID window", legacy_channel_ids, cached_channel_ids, lambda i: (BENCH_CHANNEL_ID,)),
+        ("reaction update", legacy_reactions, cached_reactions, lambda i: (ids[i % len(ids)],)),
+        ("bulk delete (10 ids)", legacy_bulk_delete, cached_bulk_delete, lambda i: (missing,)),
+    ]
+
+    def insert_batches(insert):
+        """Mean µs per message over iterations // batch_size batches"""
+        nonlocal next_id
+        batches = max(1, iterations // batch_size)
+        started = time.perf_counter()
+        for _ in range(batches):
+            rows = [bench_row(next_id + n) for n in range(batch_size)]
+            next_id += batch_size
+            insert(rows)
+        return (time.perf_counter() - started) / (batches * batch_size) * 1e6
+
+    def legacy_insert(rows):
+        db = SessionLocal()
+        try:
+            legacy_save_batch(db, rows)
+        finally:
+            db.close()
+
+    try:
+        print(f"   {'statement':<24}{'ORM query':>12}{'cached':>12}{'saved':>10}")
+        for label, legacy, cached, make_args in cases:
+            # Warm up both paths (compiled caches, prepared statements)
+            time_calls(legacy, 20, make_args)
+            time_calls(cached, 20, make_args)
+            old = time_calls(legacy, iterations, make_args)
+            new = time_calls(cached, iterations, make_args)
+            print(f"   {label:<24}{old:>10.1f}µs{new:>10.1f}µs{1 - new / old:>10.0%}")
+
+        # Insert batches: per-op ORM inserts vs one ON CONFLICT executemany
+        old = insert_batches(legacy_insert)
+        new = insert_batches(lambda rows: apply_write_ops([["save", row] for row in rows]))
+        label = f"insert (batch {batch_size})"
+        print(f"   {label:<24}{old:>10.1f}µs{new:>10.1f}µs{1 - new / old:>10.0%}   per message")
+
+    finally:
+        bulk_delete_messages(list(range(BENCH_FIRST_ID, next_id)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-call overhead of ORM queries vs cached Core statements")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per statement")
+    parser.add_argument("--batch", type=int, default=100, help="Messages per insert batch")
+    args = parser.parse_args()
+
+    run_benchmark(args.iterations, args.batch)
@@ -0,0 +1,444 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.append('.')
+from sqlalchemy import select, text, insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from database.connection import get_engine
+from database.models import Message
+from services.buffer_service import (
+    DISCORD_EPOCH_MS,
+    SNOWFLAKE_TIMESTAMP_SHIFT,
+    SELECT_CHANNEL_MESSAGE_IDS,
+    SELECT_CHANNEL_MESSAGE_IDS_SINCE,
+    SELECT_CHANNEL_MESSAGE_IDS_BETWEEN,
+    filter_messages,
+    messages_page_statement,
+    snowflake_from_datetime
+)
+
+# Plans are checked against a seeded copy of the messages table (built from the
+# current model, indexes included) in its own schema, never the live table.
+SCHEMA = "query_plan_check"
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plans.json")
+
+# Synthetic data shape: skewed guild/channel/author sizes like a real bot
+GUILDS = 20
+CHANNELS_PER_GUILD = 25
+AUTHORS_PER_GUILD = 300
+DAYS = 365
+DATA_END = datetime(2025, 1, 1, tzinfo=timezone.utc)
+ATTACHMENT_RATE = 0.08
+REACTION_RATE = 0.15
+
+# The largest and smallest guild - a plan that is fine for one can be terrible for the other
+PROFILES = {"large": 0, "small": GUILDS - 1}
+
+# Channels/members picked in a /list search (busiest first)
+SEARCH_PICKS = 3
+
+# Cases allowed past the global --max-blocks budget. Attachments AND reactions
+# leave ~1% of the busiest channel + author's messages, spread over the whole
+# year, so any plan reads thousands of heap pages to find 20 of them.
+CASE_MAX_BLOCKS = {
+    "get_messages/large[channel+author+attachments+reactions]": 6000,
+}
+
+
+class explain(Executable, ClauseElement):
+    """EXPLAIN (ANALYZE, BUFFERS) of a statement, executed with its real bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def plan_engine():
+    """The engine with unqualified tables mapped to SCHEMA"""
+    return get_engine().execution_options(schema_translate_map={None: SCHEMA})
+
+
+# ============= Dataset =============
+
+def zipf_weights(n):
+    return list(itertools.accumulate(1 / (i + 1) for i in range(n)))
+
+
+def guild_id(g):
+    return 1000 + g
+
+
+def channel_id(g, c):
+    return 100000 + g * 100 + c
+
+
+def author_id(g, a):
+    return 5000000 + g * 1000 + a
+
+
+def generate_rows(count, seed=0):
+    """Synthetic messages in arrival (snowflake) order spread over DAYS days"""
+    rng = random.Random(seed)
+    guild_weights = zipf_weights(GUILDS)
+    channel_weights = zipf_weights(CHANNELS_PER_GUILD)
+    author_weights = zipf_weights(AUTHORS_PER_GUILD)
+    start = DATA_END - timedelta(days=DAYS)
+    step_ms = DAYS * 86400000 / count
+
+    for i in range(count):
+        created = start + timedelta(milliseconds=i * step_ms)
+        ms = int(created.timestamp() * 1000) - DISCORD_EPOCH_MS
+        g = rng.choices(range(GUILDS), cum_weights=guild_weights)[0]
+        a = rng.choices(range(AUTHORS_PER_GUILD), cum_weights=author_weights)[0]
+        reacted = rng.random() < REACTION_RATE
+        yield {
+            "message_id": ms * SNOWFLAKE_TIMESTAMP_SHIFT + (i % SNOWFLAKE_TIMESTAMP_SHIFT),
+            "guild_id": guild_id(g),
+            "channel_id": channel_id(g, rng.choices(range(CHANNELS_PER_GUILD), cum_weights=channel_weights)[0]),
+            "author_id": author_id(g, a),
+            "author_name": f"user{a}",
+            "content": "x" * rng.randrange(20, 200),
+            "created_at": created,
+            "is_pinned": False,
+            "has_attachments": rng.random() < ATTACHMENT_RATE,
+            "has_embeds": False,
+            "reaction_count": rng.randrange(1, 10) if reacted else 0,
+        }
+
+
+def seed_dataset(rows, batch_size=5000):
+    """(Re)create the scratch schema from the current model and fill it"""
+    engine = plan_engine()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        # The statistics objects created with the table are named unqualified
+        conn.execute(text(f"SET LOCAL search_path TO {SCHEMA}"))
+        Message.__table__.create(conn)
+
+    batch = []
+    for row in generate_rows(rows):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(insert(Message.__table__), batch)
+            batch = []
+    if batch:
+        with engine.begin() as conn:
+            conn.execute(insert(Message.__table__), batch)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {SCHEMA}.messages"))
+
+
+def dataset_rows():
+    """Rows in the scratch table, or None if it doesn't exist"""
+    with get_engine().connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": f"{SCHEMA}.messages"}).scalar()
+        if exists is None:
+            return None
+        return conn.execute(text(f"SELECT count(*) FROM {SCHEMA}.messages")).scalar()
+
+
+# ============= Cases =============
+
+def allowed_indexes(profile, channel, author, in_lists=False):
+    """Indexes a good plan for a guild-scoped filter uses"""
+    if author:
+        allowed = {"idx_guild_author_message"}
+        if channel:
+            allowed |= {"idx_channel_message", "idx_guild_channel_message"}
+    elif channel:
+        allowed = {"idx_channel_message", "idx_guild_channel_message"}
+    else:
+        allowed = {"idx_guild_message"}
+    if in_lists:
+        # No single index range returns several channels/authors in message_id
+        # order; walking the guild's messages is the plan while they match densely
+        allowed.add("idx_guild_message")
+    if profile == "large":
+        # Walking the primary key backwards is a fine plan while the filters match densely
+        allowed.add("messages_pkey")
+    return allowed
+
+
+def build_page_cases(profile, g, window_end):
+    """
+    The /list queries: IN-list filters from the channel/member selects, each
+    as the first page and as next/previous keyset pages from mid-history.
+    """
+    channel_ids = [channel_id(g, c) for c in range(SEARCH_PICKS)]
+    author_ids = [author_id(g, a) for a in range(SEARCH_PICKS)]
+    searches = {
+        "guild": {},
+        "channels": {"channel_ids": channel_ids},
+        "members": {"author_ids": author_ids},
+        "channels+members": {"channel_ids": channel_ids, "author_ids": author_ids},
+        "channels+dates": {"channel_ids": channel_ids,
+                           "from_date": window_end - timedelta(days=7), "to_date": window_end},
+        "members+reactions": {"author_ids": author_ids, "has_reactions": True},
+    }
+    cases = []
+    for label, search in searches.items():
+        filters = {"guild_id": guild_id(g), **search}
+        # Page from the middle of whatever range the search covers
+        middle = window_end - timedelta(days=3) if "from_date" in search else window_end
+        cursor = snowflake_from_datetime(middle)
+        pages = {"first": {}, "next": {"before_id": cursor}, "prev": {"after_id": cursor}}
+        allowed = allowed_indexes(profile, "channel_ids" in search, "author_ids" in search, in_lists=True)
+        for page, keyset in pages.items():
+            statement = messages_page_statement(filters, limit=5, **keyset)
+            cases.append((f"get_messages_page/{profile}[{label}]/{page}", statement, {}, allowed))
+    return cases
+
+
+def build_cases():
+    """
+    Every get_messages filter combination (has_reactions as search pages pass
+    it) and the /list search pages for the largest and smallest guild, plus
+    the reconciliation ID lookups.
+
+    Returns:
+        list: (name, statement, params, allowed index names) tuples
+    """
+    window_end = DATA_END - timedelta(days=DAYS // 2)
+    cases = []
+
+    for profile, g in PROFILES.items():
+        for use_channel, use_author, use_dates, attachments, reactions in itertools.product(
+            (False, True), (False, True), (False, True), (False, True), (None, True, False)
+        ):
+            filters = {"guild_id": guild_id(g)}
+            labels = []
+            if use_channel:
+                filters["channel_id"] = channel_id(g, 0)
+                labels.append("channel")
+            if use_author:
+                filters["author_id"] = author_id(g, 0)
+                labels.append("author")
+            if use_dates:
+                filters["from_date"] = window_end - timedelta(days=7)
+                filters["to_date"] = window_end
+                labels.append("dates")
+            if attachments:
+                filters["has_attachments"] = True
+                labels.append("attachments")
+            if reactions is not None:
+                filters["has_reactions"] = reactions
+                labels.append("reactions" if reactions else "no-reactions")
+
+            # Same query get_messages builds
+            statement = filter_messages(select(Message), **filters).order_by(Message.message_id.desc()).limit(20)
+            allowed = allowed_indexes(profile, use_channel, use_author)
+
+            name = f"get_messages/{profile}[{'+'.join(labels) or 'guild'}]"
+            cases.append((name, statement, {}, allowed))
+
+        cases += build_page_cases(profile, g, window_end)
+
+        allowed = {"idx_channel_message", "messages_pkey"} if profile == "large" else {"idx_channel_message"}
+        cases.append((
+            f"get_channel_message_ids/{profile}",
+            SELECT_CHANNEL_MESSAGE_IDS,
+            {"channel_id": channel_id(g, 0), "limit": 100},
+            allowed,
+        ))
+        cases.append((
+            f"get_channel_message_ids_since/{profile}",
+            SELECT_CHANNEL_MESSAGE_IDS_SINCE,
+            {"channel_id": channel_id(g, 0), "min_id": snowflake_from_datetime(DATA_END - timedelta(days=1))},
+            allowed,
+        ))
+        cases.append((
+            f"get_channel_message_ids_between/{profile}",
+            SELECT_CHANNEL_MESSAGE_IDS_BETWEEN,
+            {
+                "channel_id": channel_id(g, 0),
+                "min_id": snowflake_from_datetime(DATA_END - timedelta(days=1)),
+                "max_id": snowflake_from_datetime(DATA_END, high=True),
+            },
+            allowed,
+        ))
+
+    return cases
+
+
+# ============= Plans =============
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_shape(node):
+    """Compact one-line plan, e.g. 'Limit > Index Scan Backward(idx_guild_message)'"""
+    label = node["Node Type"]
+    if node.get("Scan Direction") == "Backward":
+        label += " Backward"
+    if "Index Name" in node:
+        label += f"({node['Index Name']})"
+    children = [plan_shape(child) for child in node.get("Plans", [])]
+    if len(children) == 1:
+        return f"{label} > {children[0]}"
+    if children:
+        return f"{label} > [{', '.join(children)}]"
+    return label
+
+
+def explain_case(conn, statement, params, runs):
+    """Run EXPLAIN ANALYZE `runs` times (after one warm-up) and summarize the plan"""
+    conn.execute(explain(statement), params)
+    results = [conn.execute(explain(statement), params).scalar()[0] for _ in range(runs)]
+
+    plan = results[-1]["Plan"]
+    nodes = list(plan_nodes(plan))
+    return {
+        "plan": plan_shape(plan),
+        "indexes": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+        "seq_scan": any(n["Node Type"] == "Seq Scan" for n in nodes),
+        "rows": plan["Actual Rows"],
+        "shared_blocks": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "execution_ms": statistics.median(r["Execution Time"] for r in results),
+    }
+
+
+def check_case(result, allowed, baseline, max_ms, max_blocks, tolerance):
+    """
+    Returns:
+        tuple: (failures, warnings) - lists of messages
+    """
+    failures = []
+    warnings = []
+
+    if result["seq_scan"]:
+        failures.append("sequential scan on messages")
+    if not allowed & set(result["indexes"]):
+        failures.append(f"uses none of {', '.join(sorted(allowed))}")
+    if result["execution_ms"] > max_ms:
+        failures.append(f"{result['execution_ms']:.2f}ms > {max_ms:g}ms budget")
+    if result["shared_blocks"] > max_blocks:
+        failures.append(f"{result['shared_blocks']} buffers > {max_blocks} budget")
+
+    if baseline:
+        # Buffer counts are deterministic for the seeded dataset; timings are not
+        limit = max(baseline["shared_blocks"] * tolerance, baseline["shared_blocks"] + 50)
+        if result["shared_blocks"] > limit:
+            failures.append(f"buffers regressed {baseline['shared_blocks']} -> {result['shared_blocks']}")
+        if result["plan"] != baseline["plan"]:
+            warnings.append(f"plan changed (was: {baseline['plan']})")
+
+    return failures, warnings
+
+
+def unused_indexes(results):
+    """Model indexes no checked query used"""
+    defined = {index.name for index in Message.__table__.indexes} | {"messages_pkey"}
+    used = set().union(*(r["indexes"] for r in results.values()))
+    return sorted(defined - used)
+
+
+def print_report(results, outcomes, show_unused=True):
+    print("=" * 100)
+    print(" QUERY PLAN CHECK")
+    print("-" * 100)
+    print(f"   {'case':<58}{'ms':>8}{'buffers':>9}{'rows':>6}  result")
+    for name, r in results.items():
+        failures, warnings = outcomes[name]
+        status = "❌ " + "; ".join(failures) if failures else ("⚠️ " if warnings else "✅")
+        print(f"   {name:<58}{r['execution_ms']:>8.2f}{r['shared_blocks']:>9}{r['rows']:>6}  {status}")
+        if failures or warnings:
+            print(f"      {r['plan']}")
+            for warning in warnings:
+                print(f"      ⚠️ {warning}")
+    print("-" * 100)
+
+    unused = unused_indexes(results) if show_unused else []
+    if unused:
+        print(f"   Indexes no checked query used: {', '.join(unused)}")
+
+    failed = sum(1 for failures, _ in outcomes.values() if failures)
+    changed = sum(1 for _, warnings in outcomes.values() if warnings)
+    print(f"   {len(results)} cases: {failed} failed, {changed} with changed plans")
+    print("=" * 100)
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="EXPLAIN ANALYZE every message filter combination on a seeded dataset and check "
+                    "index usage, latency budgets and regressions against a baseline"
+    )
+    parser.add_argument("--rows", type=int, default=500000, help="Synthetic messages to seed")
+    parser.add_argument("--reuse", action="store_true", help="Reuse the seeded schema if it has --rows rows")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    parser.add_argument("--runs", type=int, default=3, help="EXPLAIN ANALYZE runs per case (median is reported)")
+    parser.add_argument("--max-ms", type=float, default=25.0, help="Execution time budget per query")
+    parser.add_argument("--max-blocks", type=int, default=2000, help="Shared buffer budget per query")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed buffer growth over the baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run's results as the new baseline")
+    parser.add_argument("--case", help="Only run cases whose name contains this")
+    args = parser.parse_args()
+
+    if get_engine().dialect.name != "postgresql":
+        sys.exit("The query plan check needs PostgreSQL (EXPLAIN ANALYZE, BUFFERS)")
+
+    if args.reuse and dataset_rows() == args.rows:
+        print(f"♻️ Reusing {args.rows} seeded messages in {SCHEMA}")
+    else:
+        print(f"🧪 Seeding {args.rows} messages into {SCHEMA}...")
+        seed_dataset(args.rows)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("rows") != args.rows:
+            print(f"⚠️ Baseline was recorded with {baseline.get('rows')} rows, not comparing")
+            baseline = {}
+
+    cases = [case for case in build_cases() if not args.case or args.case in case[0]]
+    results = {}
+    outcomes = {}
+    try:
+        with plan_engine().connect() as conn:
+            for name, statement, params, allowed in cases:
+                results[name] = explain_case(conn, statement, params, args.runs)
+                outcomes[name] = check_case(
+                    results[name], allowed, baseline.get("cases", {}).get(name),
+                    args.max_ms, CASE_MAX_BLOCKS.get(name, args.max_blocks), args.tolerance
+                )
+    finally:
+        if not args.keep:
+            with get_engine().begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+    failed = print_report(results, outcomes, show_unused=not args.case)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "rows": args.rows,
+                "cases": {
+                    name: {key: r[key] for key in ("plan", "indexes", "shared_blocks")}
+                    for name, r in results.items()
+                },
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"💾 Baseline written to {args.baseline}")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import signal
+import sys
+
+import discord
+
+sys.path.append('.')
+from config import DISCORD_TOKEN, SHARD_COUNT, CLUSTER_PROCESSES, validate as validate_config
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# Seconds between starting clusters so IDENTIFY calls don't collide
+CLUSTER_START_DELAY = 5.0
+
+# Restart backoff for crashed clusters
+RESTART_DELAY_MIN = 5.0
+RESTART_DELAY_MAX = 300.0
+
+
+async def fetch_recommended_shard_count(token: str) -> int:
+    """Ask Discord how many shards this bot should run"""
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(token)
+        shards, _, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+
+def split_shards(shard_count: int, processes: int):
+    """
+    Split shard IDs into contiguous groups, one per process.
+    
+    Args:
+        shard_count: Total number of shards
+        processes: Number of cluster processes
+    
+    Returns:
+        list[list[int]]: Shard IDs for each cluster (empty groups are dropped)
+    """
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    
+    groups = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        groups.append(list(range(start, start + size)))
+        start += size
+    
+    return groups
+
+
+async def run_cluster(cluster_id: int, shard_ids, shard_count: int, stop: asyncio.Event):
+    """
+    Run one bot process for a shard group, restarting it if it crashes.
+    
+    Each process builds its own DB pool and handlers, so clusters share nothing
+    but the database.
+    """
+    env = dict(os.environ)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARD_IDS"] = ",".join(str(s) for s in shard_ids)
+    env["CLUSTER_ID"] = str(cluster_id)
+    
+    delay = RESTART_DELAY_MIN
+    
+    while not stop.is_set():
+        print(f"🚀 Starting cluster {cluster_id} with shards {shard_ids}")
+        process = await asyncio.create_subprocess_exec(sys.executable, MAIN_SCRIPT, env=env)
+        
+        waiter = asyncio.ensure_future(process.wait())
+        stopper = asyncio.ensure_future(stop.wait())
+        await asyncio.wait({waiter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        
+        if stop.is_set():
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+            waiter.cancel()
+            break
+        
+        stopper.cancel()
+        print(f"⚠️ Cluster {cluster_id} exited with code {process.returncode}, restarting in {delay:.0f}s")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        delay = min(delay * 2, RESTART_DELAY_MAX)
+    
+    print(f"🛑 Cluster {cluster_id} stopped")
+
+
+async def main():
+    shard_count = SHARD_COUNT or await fetch_recommended_shard_count(DISCORD_TOKEN)
+    groups = split_shards(shard_count, CLUSTER_PROCESSES)
+    
+    print("=" * 50)
+    print(f"🧩 Launching {len(groups)} cluster(s) for {shard_count} shard(s)")
+    print("=" * 50)
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    
+    tasks = []
+    for cluster_id, shard_ids in enumerate(groups):
+        tasks.append(asyncio.create_task(run_cluster(cluster_id, shard_ids, shard_count, stop)))
+        await asyncio.sleep(CLUSTER_START_DELAY)
+    
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    validate_config()
+    asyncio.run(main())
@@ -1,23 +1,149 @@
 
 
+import functools
 import os
 from dotenv import load_dotenv
 
-# .env file load karo
-load_dotenv()
 
-# Database URL
-DATABASE_URL = os.getenv("DATABASE_URL")
+def parse_guild_map(value):
+    """Parse "guild_id:number,guild_id:number" into {guild_id: float}"""
+    result = {}
+    for entry in (value or "").split(","):
+        if entry.strip():
+            guild_id, number = entry.split(":")
+            result[int(guild_id)] = float(number)
+    return result
 
-# Discord Bot Token  
-DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in .env file!")
+@functools.cache
+def load_settings():
+    """
+    Read .env and the environment (once - later calls return the same dict).
 
-if not DISCORD_TOKEN:
-    raise ValueError("DISCORD_BOT_TOKEN not found in .env file!")
+    Nothing happens at import time: settings load on first use, through this
+    function or by importing a setting name (``from config import DATABASE_URL``).
+    Missing required settings are reported by ``validate()``, not here.
+    """
+    # .env file load karo
+    load_dotenv()
 
-# Test print (baad mein remove karenge)
-print("✅ Config loaded successfully!")
-print(f"Database URL starts with: {DATABASE_URL[:20]}...")
\ No newline at end of file
+    # Database URL
+    DATABASE_URL = os.getenv("DATABASE_URL")
+
+    # Optional read replicas, comma separated (read-only queries are routed here)
+    DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+
+    # Replicas further behind the primary than this are skipped
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+    # Connection pool (per engine)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+    # Seconds a handler waits for a call on the DB executor (0 = no limit)
+    DB_CALL_TIMEOUT = float(os.getenv("DB_CALL_TIMEOUT", "30"))
+
+    # psycopg prepares a statement server-side once it has run this many times on a
+    # connection ("none" disables - needed behind PgBouncer in transaction mode)
+    DB_PREPARE_THRESHOLD = os.getenv("DB_PREPARE_THRESHOLD", "2")
+    DB_PREPARE_THRESHOLD = None if DB_PREPARE_THRESHOLD.lower() == "none" else int(DB_PREPARE_THRESHOLD)
+
+    # JSON backend for JSON columns and the spill log: auto / orjson / msgspec / json
+    JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "auto")
+
+    # Discord Bot Token  
+    DISCORD_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+
+    # Optional: record the gateway dispatch stream to this file (for offline replay)
+    EVENT_RECORD_PATH = os.getenv("EVENT_RECORD_PATH")
+
+    # Sharding - leave unset to let Discord pick the shard count (single process)
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+
+    # Comma separated shard IDs this process should run, e.g. "0,1,2" (set by cluster.py)
+    SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS").split(",")] if os.getenv("SHARD_IDS") else None
+
+    # Cluster launcher settings
+    CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+    CLUSTER_PROCESSES = int(os.getenv("CLUSTER_PROCESSES", "1"))
+
+    # Cache profile: "default" (discord.py defaults) or "lean" (small caches, no chunking)
+    CACHE_PROFILE = os.getenv("CACHE_PROFILE", "default")
+
+    # Optional overrides for the cache profile
+    MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE")) if os.getenv("MESSAGE_CACHE_SIZE") else None
+    MEMBER_CACHE = os.getenv("MEMBER_CACHE")  # all / joined / voice / none
+    CHUNK_GUILDS_AT_STARTUP = None
+    if os.getenv("CHUNK_GUILDS_AT_STARTUP"):
+        CHUNK_GUILDS_AT_STARTUP = os.getenv("CHUNK_GUILDS_AT_STARTUP").lower() in ("1", "true", "yes")
+
+    # Ingest pipeline: bounded queue in front of the DB, spilling to a local log
+    # when the DB is slow or down
+    SPILL_LOG_PATH = os.getenv("SPILL_LOG_PATH", "ingest_spill.log")
+    SPILL_FSYNC_INTERVAL = float(os.getenv("SPILL_FSYNC_INTERVAL", "0.5"))
+    # Soft limit, not a cap: past it reaction updates are shed and a warning is
+    # logged, but saves, edits and deletes keep spilling (nothing else is dropped)
+    SPILL_LOG_MAX_MB = int(os.getenv("SPILL_LOG_MAX_MB", "512"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+    INGEST_OVERFLOW_POLICY = os.getenv("INGEST_OVERFLOW_POLICY", "spill")  # spill / shed
+
+    # Per-guild fair scheduling: queue bound, DRR quantum (ops per round at weight 1),
+    # weights ("guild_id:weight,...") and rate caps in ops/sec (0 = unlimited)
+    INGEST_GUILD_QUEUE_SIZE = int(os.getenv("INGEST_GUILD_QUEUE_SIZE", "2000"))
+    INGEST_QUANTUM = int(os.getenv("INGEST_QUANTUM", "10"))
+    INGEST_GUILD_WEIGHTS = parse_guild_map(os.getenv("INGEST_GUILD_WEIGHTS"))
+    INGEST_GUILD_RATE_CAP = float(os.getenv("INGEST_GUILD_RATE_CAP", "0"))
+    INGEST_GUILD_RATE_CAPS = parse_guild_map(os.getenv("INGEST_GUILD_RATE_CAPS"))
+
+    # Periodic reconciliation: revisit interval bounds (seconds), history requests
+    # per minute across all channels, and the ingest write lag that pauses it
+    PERIODIC_RECONCILE = os.getenv("PERIODIC_RECONCILE", "true").lower() in ("1", "true", "yes")
+    RECONCILE_MIN_INTERVAL = float(os.getenv("RECONCILE_MIN_INTERVAL", "300"))
+    RECONCILE_MAX_INTERVAL = float(os.getenv("RECONCILE_MAX_INTERVAL", "86400"))
+    RECONCILE_API_BUDGET = float(os.getenv("RECONCILE_API_BUDGET", "30"))
+    RECONCILE_MAX_INGEST_LAG_MS = float(os.getenv("RECONCILE_MAX_INGEST_LAG_MS", "2000"))
+
+    # History backfill: channels fetched at once, messages per DB transaction, and
+    # the ingest queue depth above which backfill writes wait for live ingest
+    BACKFILL_ON_JOIN = os.getenv("BACKFILL_ON_JOIN", "true").lower() in ("1", "true", "yes")
+    BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "2"))
+    BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+    BACKFILL_PAUSE_DEPTH = int(os.getenv("BACKFILL_PAUSE_DEPTH", "100"))
+
+    # Where /export writes its files
+    EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+
+    # Seconds a saved /list search (and its result buttons) stays valid
+    SEARCH_QUERY_TTL = float(os.getenv("SEARCH_QUERY_TTL", "86400"))
+
+    # Where the hash of the last synced slash command tree is stored
+    COMMAND_SYNC_HASH_PATH = os.getenv("COMMAND_SYNC_HASH_PATH", ".command_tree_hash")
+
+    return {name: value for name, value in locals().items() if name.isupper()}
+
+
+def validate():
+    """Raise ValueError if a setting the bot cannot start without is missing"""
+    settings = load_settings()
+
+    if not settings["DATABASE_URL"]:
+        raise ValueError("DATABASE_URL not found in .env file!")
+
+    if not settings["DISCORD_TOKEN"]:
+        raise ValueError("DISCORD_BOT_TOKEN not found in .env file!")
+
+    if settings["SHARD_IDS"] is not None and settings["SHARD_COUNT"] is None:
+        raise ValueError("SHARD_COUNT must be set when SHARD_IDS is given!")
+
+
+def __getattr__(name):
+    # Module attributes are the settings, loaded on first access
+    if not name.startswith("__"):
+        settings = load_settings()
+        if name in settings:
+            return settings[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
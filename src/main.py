@@ -2,22 +2,64 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import math
 import asyncio
+import hashlib
+import json
+import os
 
 sys.path.append('.')
 from services.buffer_service import (
-    save_message, 
-    update_message, 
-    delete_message, 
-    get_messages,
-    update_reactions,
-    bulk_delete_messages,
-    message_exists
+    get_messages_page,
+    count_messages,
+    save_search_query,
+    get_search_query,
+    delete_expired_search_queries,
+    reactions_to_data
+)
+from database.connection import pool_status
+from services.db_executor import db_executor, run_db
+from services.reconciliation_service import run_startup_reconciliation, run_gap_reconciliation, PeriodicReconciler
+from services.replay_service import EventRecorder
+from services.cache_service import build_cache_options, guild_cache_report
+from services.ingest_service import IngestPipeline, SpillLog, FairScheduler
+from services.backfill_service import BackfillRunner
+from config import (
+    validate as validate_config,
+    DISCORD_TOKEN,
+    EVENT_RECORD_PATH,
+    SHARD_COUNT,
+    SHARD_IDS,
+    CLUSTER_ID,
+    COMMAND_SYNC_HASH_PATH,
+    CACHE_PROFILE,
+    MESSAGE_CACHE_SIZE,
+    MEMBER_CACHE,
+    CHUNK_GUILDS_AT_STARTUP,
+    SPILL_LOG_PATH,
+    SPILL_FSYNC_INTERVAL,
+    SPILL_LOG_MAX_MB,
+    INGEST_QUEUE_SIZE,
+    INGEST_BATCH_SIZE,
+    INGEST_OVERFLOW_POLICY,
+    INGEST_GUILD_QUEUE_SIZE,
+    INGEST_QUANTUM,
+    INGEST_GUILD_WEIGHTS,
+    INGEST_GUILD_RATE_CAP,
+    INGEST_GUILD_RATE_CAPS,
+    PERIODIC_RECONCILE,
+    RECONCILE_MIN_INTERVAL,
+    RECONCILE_MAX_INTERVAL,
+    RECONCILE_API_BUDGET,
+    RECONCILE_MAX_INGEST_LAG_MS,
+    BACKFILL_ON_JOIN,
+    BACKFILL_CONCURRENCY,
+    BACKFILL_BATCH_SIZE,
+    BACKFILL_PAUSE_DEPTH,
+    EXPORT_DIR,
+    SEARCH_QUERY_TTL
 )
-from services.reconciliation_service import run_startup_reconciliation
-from config import DISCORD_TOKEN
 
 
 # Bot setup - intents define 
@@ -27,11 +69,72 @@ intents.guilds = True
 intents.members = True
 intents.reactions = True  # Enable reaction events
 
-# Bot creation
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Bot creation - AutoShardedBot runs every shard in this process unless
+# SHARD_IDS restricts it to a shard group (see cluster.py).
+# Debug events are only needed when recording the gateway stream.
+# Cache sizes come from the cache profile (see cache_service.py).
+bot = commands.AutoShardedBot(
+    command_prefix="!",
+    intents=intents,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    enable_debug_events=bool(EVENT_RECORD_PATH),
+    **build_cache_options(
+        CACHE_PROFILE,
+        message_cache_size=MESSAGE_CACHE_SIZE,
+        member_cache=MEMBER_CACHE,
+        chunk_at_startup=CHUNK_GUILDS_AT_STARTUP
+    )
+)
+
+# All gateway writes go through the ingest pipeline so handlers never block on the DB.
+# Guilds are scheduled fairly so one noisy guild only delays its own writes.
+ingest = IngestPipeline(
+    SpillLog(SPILL_LOG_PATH, fsync_interval=SPILL_FSYNC_INTERVAL, max_bytes=SPILL_LOG_MAX_MB * 1024 * 1024),
+    scheduler=FairScheduler(
+        quantum=INGEST_QUANTUM,
+        weights=INGEST_GUILD_WEIGHTS,
+        default_rate_cap=INGEST_GUILD_RATE_CAP,
+        rate_caps=INGEST_GUILD_RATE_CAPS
+    ),
+    queue_size=INGEST_QUEUE_SIZE,
+    guild_queue_size=INGEST_GUILD_QUEUE_SIZE,
+    batch_size=INGEST_BATCH_SIZE,
+    overflow_policy=INGEST_OVERFLOW_POLICY
+)
+
+# Full history backfill for new guilds - resumable, and always yields to live ingest
+backfill = BackfillRunner(
+    ingest,
+    concurrency=BACKFILL_CONCURRENCY,
+    batch_size=BACKFILL_BATCH_SIZE,
+    pause_depth=BACKFILL_PAUSE_DEPTH
+)
+
+# Keeps reconciling after startup - busy channels often, dormant ones rarely
+reconciler = PeriodicReconciler(
+    bot,
+    ingest,
+    min_interval=RECONCILE_MIN_INTERVAL,
+    max_interval=RECONCILE_MAX_INTERVAL,
+    api_budget=RECONCILE_API_BUDGET,
+    max_ingest_lag_ms=RECONCILE_MAX_INGEST_LAG_MS
+)
+
+# Gateway recorder for offline load testing (see replay.py)
+event_recorder = EventRecorder(EVENT_RECORD_PATH) if EVENT_RECORD_PATH else None
 
 # Constants
 MESSAGES_PER_PAGE = 5
+DB_BUSY_MESSAGE = "⏳ The database is busy right now, please try again in a moment."
+SEARCH_CLEANUP_INTERVAL = 3600  # Seconds between expired saved search cleanups
+
+# Startup state - on_ready/on_shard_ready fire again on every reconnect
+startup_done = False
+reconciled_shards = set()
+shard_disconnected_at = {}
+reconciliation_tasks = {}
+search_cleanup_task = None
 
 
 # ============= Date Input Modal =============
@@ -58,12 +161,14 @@ class DateInputModal(discord.ui.Modal):
     
     async def on_submit(self, interaction: discord.Interaction):
         try:
-            date_value = datetime.strptime(self.date_input.value, "%Y-%m-%d")
+            # Dates are UTC days; filters turn them into message_id (snowflake) ranges
+            date_value = datetime.strptime(self.date_input.value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
             
             if self.date_type == "From":
                 self.search_view.from_date = date_value
             else:
-                self.search_view.to_date = date_value
+                # Inclusive: the whole "to" day, up to its last millisecond
+                self.search_view.to_date = date_value + timedelta(days=1, milliseconds=-1)
             
             await self.search_view.update_embed(interaction)
             
@@ -74,99 +179,159 @@ class DateInputModal(discord.ui.Modal):
             )
 
 
-# ============= Results Pagination View =============
-class ResultsPaginationView(discord.ui.View):
-    """View for paginated search results"""
+# ============= Search Results Pages =============
+# Result pages are stateless: button custom_ids carry the saved query hash and
+# a keyset cursor, so every click fetches its page from the DB. Nothing is kept
+# in memory between clicks and buttons keep working across restarts and shards.
+
+def build_results_embed(messages: list, page: int, total: int, filters_summary: str, guild: discord.Guild) -> discord.Embed:
+    """Build the results embed for one page"""
+    total_pages = max(1, math.ceil(total / MESSAGES_PER_PAGE))
     
-    def __init__(self, messages: list, filters_summary: str, guild: discord.Guild):
-        super().__init__(timeout=300)
-        self.messages = messages
-        self.filters_summary = filters_summary
-        self.guild = guild
-        self.current_page = 0
-        self.total_pages = max(1, math.ceil(len(messages) / MESSAGES_PER_PAGE))
+    embed = discord.Embed(
+        title=f"📋 Search Results (Page {page + 1} of {total_pages})",
+        description=f"**{total} total messages** • Sorted by newest first\n\n{filters_summary}",
+        color=discord.Color.green()
+    )
+    
+    for msg in messages:
+        # Get channel name
+        channel = guild.get_channel(msg.channel_id)
+        channel_name = f"#{channel.name}" if channel else f"#unknown"
         
-        self.update_buttons()
-    
-    def update_buttons(self):
-        """Update button states based on current page"""
-        self.prev_button.disabled = (self.current_page == 0)
-        self.next_button.disabled = (self.current_page >= self.total_pages - 1)
-    
-    def build_results_embed(self) -> discord.Embed:
-        """Build the results embed for current page"""
-        start_idx = self.current_page * MESSAGES_PER_PAGE
-        end_idx = start_idx + MESSAGES_PER_PAGE
-        page_messages = self.messages[start_idx:end_idx]
+        # Format timestamps
+        created = msg.created_at.strftime("%b %d, %Y at %I:%M %p") if msg.created_at else "Unknown"
+        edited_text = ""
+        if msg.edited_at:
+            edited_text = f" *(edited {msg.edited_at.strftime('%b %d')})*"
         
-        embed = discord.Embed(
-            title=f"📋 Search Results (Page {self.current_page + 1} of {self.total_pages})",
-            description=f"**{len(self.messages)} total messages** • Sorted by newest first\n\n{self.filters_summary}",
-            color=discord.Color.green()
+        # Content preview (100 chars max)
+        content = msg.content[:100] + "..." if msg.content and len(msg.content) > 100 else (msg.content or "*[No text content]*")
+        
+        # Attachments indicator
+        attachments_text = ""
+        if msg.has_attachments:
+            attachments_text = "\n📎 **Attachments:** Yes"
+        
+        # Reactions summary
+        reactions_text = ""
+        if msg.reaction_count and msg.reaction_count > 0:
+            reactions_text = f"\n😊 **Reactions:** {msg.reaction_count}"
+        elif msg.reactions_data:
+            try:
+                reactions = msg.reactions_data
+                if reactions:
+                    reaction_parts = [f"{r.get('emoji', '?')} x{r.get('count', 0)}" for r in reactions[:3]]
+                    reactions_text = f"\n😊 **Reactions:** {', '.join(reaction_parts)}"
+            except:
+                pass
+        
+        # Build field
+        field_name = f"{channel_name}  •  👤 {msg.author_name}"
+        field_value = (
+            f"📅 {created}{edited_text}\n"
+            f"```{content}```"
+            f"{attachments_text}{reactions_text}"
         )
         
-        for msg in page_messages:
-            # Get channel name
-            channel = self.guild.get_channel(msg.channel_id)
-            channel_name = f"#{channel.name}" if channel else f"#unknown"
-            
-            # Format timestamps
-            created = msg.created_at.strftime("%b %d, %Y at %I:%M %p") if msg.created_at else "Unknown"
-            edited_text = ""
-            if msg.edited_at:
-                edited_text = f" *(edited {msg.edited_at.strftime('%b %d')})*"
-            
-            # Content preview (100 chars max)
-            content = msg.content[:100] + "..." if msg.content and len(msg.content) > 100 else (msg.content or "*[No text content]*")
-            
-            # Attachments indicator
-            attachments_text = ""
-            if msg.has_attachments:
-                attachments_text = "\n📎 **Attachments:** Yes"
-            
-            # Reactions summary
-            reactions_text = ""
-            if msg.reaction_count and msg.reaction_count > 0:
-                reactions_text = f"\n😊 **Reactions:** {msg.reaction_count}"
-            elif msg.reactions_data:
-                try:
-                    reactions = msg.reactions_data
-                    if reactions:
-                        reaction_parts = [f"{r.get('emoji', '?')} x{r.get('count', 0)}" for r in reactions[:3]]
-                        reactions_text = f"\n😊 **Reactions:** {', '.join(reaction_parts)}"
-                except:
-                    pass
-            
-            # Build field
-            field_name = f"{channel_name}  •  👤 {msg.author_name}"
-            field_value = (
-                f"📅 {created}{edited_text}\n"
-                f"```{content}```"
-                f"{attachments_text}{reactions_text}"
+        embed.add_field(name=field_name, value=field_value, inline=False)
+    
+    embed.set_footer(text=f"Use buttons below to navigate • Page {page + 1}/{total_pages}")
+    
+    return embed
+
+
+def build_results_view(query_hash: str, messages: list, page: int, has_older: bool) -> discord.ui.View:
+    """Build the (persistent) navigation buttons for a results page"""
+    view = discord.ui.View(timeout=None)
+    
+    newest_id = messages[0].message_id if messages else 0
+    oldest_id = messages[-1].message_id if messages else 0
+    
+    view.add_item(SearchPageButton(query_hash, "prev", newest_id, page - 1, disabled=(page == 0)))
+    view.add_item(SearchPageButton(query_hash, "next", oldest_id, page + 1, disabled=not has_older))
+    view.add_item(SearchCloseButton())
+    
+    return view
+
+
+class SearchPageButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"search:(?P<query>[0-9a-f]{16}):(?P<direction>prev|next):(?P<cursor>\d+):(?P<page>-?\d+)"
+):
+    """Previous / Next button; custom_id = search:<query hash>:<direction>:<keyset cursor>:<page>"""
+    
+    def __init__(self, query_hash: str, direction: str, cursor: int, page: int, disabled: bool = False):
+        self.query_hash = query_hash
+        self.direction = direction
+        self.cursor = cursor
+        self.page = page
+        super().__init__(
+            discord.ui.Button(
+                label="◀ Previous" if direction == "prev" else "Next ▶",
+                style=discord.ButtonStyle.secondary,
+                custom_id=f"search:{query_hash}:{direction}:{cursor}:{page}",
+                disabled=disabled,
+                row=0
             )
-            
-            embed.add_field(name=field_name, value=field_value, inline=False)
+        )
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["query"], match["direction"], int(match["cursor"]), int(match["page"]))
+    
+    async def callback(self, interaction: discord.Interaction):
+        # DB calls may queue behind others, don't let the 3s interaction deadline run out
+        await interaction.response.defer()
         
-        embed.set_footer(text=f"Use buttons below to navigate • Page {self.current_page + 1}/{self.total_pages}")
+        try:
+            saved = await run_db(get_search_query, self.query_hash, max_age=SEARCH_QUERY_TTL)
+            if saved is None or saved[0]["guild_id"] != interaction.guild_id:
+                await interaction.followup.send("❌ This search has expired, run `/list` again.", ephemeral=True)
+                return
+            
+            filters, filters_summary, total = saved
+            page = max(0, self.page)
+            
+            if self.direction == "next":
+                messages, has_older = await run_db(
+                    get_messages_page, filters, before_id=self.cursor, limit=MESSAGES_PER_PAGE
+                )
+            else:
+                messages, has_newer = await run_db(
+                    get_messages_page, filters, after_id=self.cursor, limit=MESSAGES_PER_PAGE
+                )
+                if not has_newer:
+                    # Back at the newest messages (also covers rows deleted since)
+                    page = 0
+                has_older = True
+        except TimeoutError:
+            await interaction.followup.send(DB_BUSY_MESSAGE, ephemeral=True)
+            return
         
-        return embed
+        embed = build_results_embed(messages, page, total, filters_summary, interaction.guild)
+        view = build_results_view(self.query_hash, messages, page, has_older)
+        await interaction.edit_original_response(embed=embed, view=view)
+
+
+class SearchCloseButton(discord.ui.DynamicItem[discord.ui.Button], template=r"search:close"):
+    """Close button for search results"""
     
-    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary, row=0)
-    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page = max(0, self.current_page - 1)
-        self.update_buttons()
-        embed = self.build_results_embed()
-        await interaction.response.edit_message(embed=embed, view=self)
+    def __init__(self):
+        super().__init__(
+            discord.ui.Button(
+                label="✕ Close",
+                style=discord.ButtonStyle.danger,
+                custom_id="search:close",
+                row=0
+            )
+        )
     
-    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary, row=0)
-    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_page = min(self.total_pages - 1, self.current_page + 1)
-        self.update_buttons()
-        embed = self.build_results_embed()
-        await interaction.response.edit_message(embed=embed, view=self)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls()
     
-    @discord.ui.button(label="✕ Close", style=discord.ButtonStyle.danger, row=0)
-    async def close_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def callback(self, interaction: discord.Interaction):
         await interaction.response.edit_message(content="*Search results closed.*", embed=None, view=None)
 
 
@@ -332,32 +497,25 @@ class MessageSearchView(discord.ui.View):
     async def submit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         
-        # Build filter parameters
-        guild_id = self.guild.id
-        channel_ids = [c.id for c in self.selected_channels] if self.selected_channels else None
-        author_ids = [m.id for m in self.selected_members] if self.selected_members else None
-        
-        # Query database - get more messages for proper pagination
-        messages = get_messages(
-            guild_id=guild_id,
-            channel_id=channel_ids[0] if channel_ids and len(channel_ids) == 1 else None,
-            author_id=author_ids[0] if author_ids and len(author_ids) == 1 else None,
-            from_date=self.from_date,
-            to_date=self.to_date,
-            limit=50  # Get more for pagination
-        )
-        
-        # Filter by multiple channels/members if needed
-        if channel_ids and len(channel_ids) > 1:
-            messages = [m for m in messages if m.channel_id in channel_ids]
-        if author_ids and len(author_ids) > 1:
-            messages = [m for m in messages if m.author_id in author_ids]
+        # Build filter parameters (all filtering happens in SQL)
+        filters = {"guild_id": self.guild.id}
+        if self.selected_channels:
+            filters["channel_ids"] = sorted(c.id for c in self.selected_channels)
+        if self.selected_members:
+            filters["author_ids"] = sorted(m.id for m in self.selected_members)
+        if self.from_date:
+            filters["from_date"] = self.from_date
+        if self.to_date:
+            filters["to_date"] = self.to_date
+        if self.reaction_filter != "any":
+            filters["has_reactions"] = self.reaction_filter == "has_reactions"
         
-        # Filter by reactions
-        if self.reaction_filter == "has_reactions":
-            messages = [m for m in messages if (m.reaction_count or 0) > 0]
-        elif self.reaction_filter == "no_reactions":
-            messages = [m for m in messages if (m.reaction_count or 0) == 0]
+        # Query database - first page plus total count
+        try:
+            messages, has_older = await run_db(get_messages_page, filters, limit=MESSAGES_PER_PAGE)
+        except TimeoutError:
+            await interaction.followup.send(DB_BUSY_MESSAGE, ephemeral=True)
+            return
         
         # Build results
         if not messages:
@@ -367,35 +525,168 @@ class MessageSearchView(discord.ui.View):
                 color=discord.Color.red()
             )
             await interaction.followup.send(embed=result_embed, ephemeral=True)
-        else:
-            # Create pagination view
-            filters_summary = self.build_filters_summary()
-            pagination_view = ResultsPaginationView(messages, filters_summary, self.guild)
-            result_embed = pagination_view.build_results_embed()
-            await interaction.followup.send(embed=result_embed, view=pagination_view, ephemeral=True)
+            return
+        
+        # Save the query so page buttons only need its hash
+        filters_summary = self.build_filters_summary()
+        try:
+            total = await run_db(count_messages, **filters)
+            query_hash = await run_db(save_search_query, filters, summary=filters_summary, total=total)
+        except TimeoutError:
+            await interaction.followup.send(DB_BUSY_MESSAGE, ephemeral=True)
+            return
+        if query_hash is None:
+            await interaction.followup.send("❌ Could not save this search, please try again.", ephemeral=True)
+            return
+        
+        result_embed = build_results_embed(messages, 0, total, filters_summary, self.guild)
+        pagination_view = build_results_view(query_hash, messages, 0, has_older)
+        await interaction.followup.send(embed=result_embed, view=pagination_view, ephemeral=True)
 
 
 
 
+@bot.event
+async def setup_hook():
+    # Runs once before connecting, inside the bot's event loop
+    ingest.start()
+    
+    # Search result buttons are persistent: route their clicks to the DynamicItems
+    bot.add_dynamic_items(SearchPageButton, SearchCloseButton)
+
+
+def command_tree_hash() -> str:
+    """Hash of the registered slash commands as they would be sent to Discord"""
+    payload = {
+        "application_id": bot.application_id,
+        "commands": sorted(
+            (cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands()),
+            key=lambda c: c["name"]
+        )
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def sync_command_tree():
+    """Sync slash commands, skipping the REST call if nothing changed since last sync"""
+    current_hash = command_tree_hash()
+    
+    try:
+        with open(COMMAND_SYNC_HASH_PATH, "r", encoding="utf-8") as f:
+            if f.read().strip() == current_hash:
+                print("✅ Slash commands unchanged, skipping sync")
+                return
+    except OSError:
+        pass
+    
+    try:
+        synced = await bot.tree.sync()
+        print(f"✅ Synced {len(synced)} slash command(s)")
+    except Exception as e:
+        print(f"❌ Sync Failed: {e}")
+        return
+    
+    try:
+        with open(COMMAND_SYNC_HASH_PATH, "w", encoding="utf-8") as f:
+            f.write(current_hash)
+    except OSError as e:
+        print(f"⚠️ Could not persist command hash: {e}")
+
+
+def start_reconciliation(shard_id, coro):
+    """Run a reconciliation task for a shard unless one is already running"""
+    running = reconciliation_tasks.get(shard_id)
+    if running and not running.done():
+        print(f"⏭️ Reconciliation already running for shard {shard_id}, skipping")
+        coro.close()
+        return
+    
+    reconciliation_tasks[shard_id] = bot.loop.create_task(coro)
+
+
 @bot.event
 async def on_ready():
+    # on_ready fires again after reconnects - only do startup work once
+    global startup_done, search_cleanup_task
+    if startup_done:
+        print(f" Reconnected ({len(bot.guilds)} server(s))")
+        return
+    startup_done = True
+    
     print(f" Bot is online!")
     print(f" Logged in as: {bot.user.name}")
     print(f" Bot ID: {bot.user.id}")
+    print(f" Cluster {CLUSTER_ID}: shards {sorted(bot.shards)} of {bot.shard_count}")
     print(f" Connected to {len(bot.guilds)} server(s)")
     print("-" * 50)
 
-    # Sync slash commands
-    try:
-        synced = await bot.tree.sync()
-        print(f"✅ Synced {len(synced)} slash command(s)")
-    except Exception as e:
-        print(f"❌ Sync Failed: {e}")
+    # Commands are global, so one cluster syncing is enough
+    if CLUSTER_ID == 0:
+        await sync_command_tree()
+    
+    if PERIODIC_RECONCILE:
+        reconciler.start()
+    
+    # Saved searches are shared, so one cluster cleaning them up is enough
+    if CLUSTER_ID == 0:
+        search_cleanup_task = asyncio.create_task(expire_search_queries(), name="search-cleanup")
     
     print("-" * 50)
+
+
+async def expire_search_queries():
+    """Background task: delete saved searches older than SEARCH_QUERY_TTL"""
+    while True:
+        try:
+            deleted = await run_db(delete_expired_search_queries, SEARCH_QUERY_TTL)
+            if deleted:
+                print(f"🧹 Deleted {deleted} expired saved search(es)")
+        except TimeoutError:
+            pass  # Database busy, retried next round
+        await asyncio.sleep(SEARCH_CLEANUP_INTERVAL)
+
+
+@bot.event
+async def on_shard_ready(shard_id):
+    print(f" Shard {shard_id} ready")
+
+    if shard_id not in reconciled_shards:
+        # First ready for this shard: full reconciliation of its guilds (non-blocking)
+        reconciled_shards.add(shard_id)
+        start_reconciliation(shard_id, run_startup_reconciliation(bot, shard_id=shard_id))
+        return
     
-    # Start reconciliation as a background task (non-blocking)
-    bot.loop.create_task(run_startup_reconciliation(bot))
+    # New session after a disconnect: only the disconnect window can have drifted
+    disconnected_at = shard_disconnected_at.pop(shard_id, None)
+    if disconnected_at:
+        start_reconciliation(shard_id, run_gap_reconciliation(bot, disconnected_at, shard_id=shard_id))
+
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    # Keep the earliest disconnect if the shard flaps several times before ready
+    shard_disconnected_at.setdefault(shard_id, datetime.now(timezone.utc))
+
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    # A RESUME replays missed events, so there is no gap to reconcile
+    shard_disconnected_at.pop(shard_id, None)
+
+
+@bot.event
+async def on_guild_join(guild):
+    # Reconciliation only covers recent messages - pull in the full history
+    print(f"➕ Joined {guild.name} ({guild.id})")
+    if BACKFILL_ON_JOIN:
+        backfill.start_guild(guild)
+
+
+@bot.event
+async def on_socket_raw_receive(payload):
+    if event_recorder:
+        event_recorder.record(payload)
 
 
 @bot.event
@@ -408,7 +699,8 @@ async def on_message(message):
         return 
     
     print(f" Message from {message.author}: {message.content[:50]}...")
-    save_message(message)
+    ingest.submit_save(message)
+    reconciler.record_activity(message.channel.id)
     
     await bot.process_commands(message)
 
@@ -422,7 +714,7 @@ async def on_message_edit(before, after):
         return
 
     print(f" Edit : '{before.content[:30]}...''{after.content[:30]}...'")
-    update_message(after)
+    ingest.submit_update(after)
 
 
 @bot.tree.command(name="list", description="Search buffered messages with filters")
@@ -438,6 +730,146 @@ async def list_messages(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, view=view)
 
 
+@bot.tree.command(name="export", description="Export buffered messages to a file")
+@app_commands.describe(
+    format="File format",
+    channel="Only export this channel",
+    member="Only export this member's messages"
+)
+@app_commands.choices(format=[
+    app_commands.Choice(name="NDJSON (gzip)", value="ndjson"),
+    app_commands.Choice(name="CSV (gzip)", value="csv"),
+    app_commands.Choice(name="Parquet (zstd)", value="parquet"),
+])
+@app_commands.default_permissions(manage_guild=True)
+async def export(
+    interaction: discord.Interaction,
+    format: app_commands.Choice[str],
+    channel: discord.TextChannel = None,
+    member: discord.Member = None
+):
+    """
+    /export - Stream this server's buffered messages to NDJSON, CSV or Parquet
+    """
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    base_path = os.path.join(EXPORT_DIR, f"messages-{interaction.guild.id}-{stamp}")
+
+    # Imported on first use - pyarrow alone is ~70ms of startup
+    from services.export_service import export_messages
+
+    try:
+        # Blocking DB cursor + file I/O; streams for as long as it takes, so no timeout
+        result = await run_db(
+            export_messages,
+            base_path,
+            fmt=format.value,
+            guild_id=interaction.guild.id,
+            channel_id=channel.id if channel else None,
+            author_id=member.id if member else None,
+            timeout=None
+        )
+    except Exception as e:
+        await interaction.followup.send(f"❌ Export failed: {e}", ephemeral=True)
+        return
+
+    summary = (
+        f"📦 **Export complete** • {result['rows']} messages • "
+        f"{result['bytes'] / (1024 * 1024):.2f} MB • {result['rows_per_sec']:.0f} rows/s"
+    )
+
+    path = result["files"][0]
+    if len(result["files"]) == 1 and result["bytes"] <= interaction.guild.filesize_limit:
+        # Uploaded files aren't kept on the host
+        try:
+            await interaction.followup.send(summary, file=discord.File(path), ephemeral=True)
+        finally:
+            os.remove(path)
+    else:
+        await interaction.followup.send(
+            f"{summary}\nToo large to upload, saved on the bot host: `{path}`",
+            ephemeral=True
+        )
+
+
+@bot.tree.command(name="analytics", description="Activity heatmap, top authors, busiest channels and reactions")
+@app_commands.describe(days="How many days back to analyse (default 30)")
+async def analytics(interaction: discord.Interaction, days: app_commands.Range[int, 1, 365] = 30):
+    """
+    /analytics - Guild activity overview computed from the buffer
+    """
+    await interaction.response.defer(thinking=True)
+
+    # Imported on first use (numpy)
+    from services.analytics_service import compute_guild_analytics, render_heatmap
+
+    # Aggregation queries are blocking, keep them off the event loop
+    try:
+        stats = await run_db(compute_guild_analytics, interaction.guild.id, days)
+    except TimeoutError:
+        await interaction.followup.send(DB_BUSY_MESSAGE)
+        return
+
+    if stats is None:
+        await interaction.followup.send("❌ Could not load analytics, try again later.")
+        return
+
+    if stats["total_messages"] == 0:
+        await interaction.followup.send(f"📊 No buffered messages in the last {days} day(s).")
+        return
+
+    embed = discord.Embed(
+        title=f"📊 Server Activity • last {days} day(s)",
+        description=(
+            f"**{stats['total_messages']:,}** messages • **{stats['active_authors']:,}** authors • "
+            f"**{stats['active_channels']:,}** channels • **{stats['total_reactions']:,}** reactions"
+        ),
+        color=discord.Color.blurple()
+    )
+
+    day, hour = stats["busiest_slot"]
+    embed.add_field(
+        name=f"🗓️ HOUR-OF-WEEK (UTC) • busiest: {day} {hour:02d}:00",
+        value=f"```{render_heatmap(stats['heatmap'])}```",
+        inline=False
+    )
+
+    authors_text = "\n".join(
+        f"`{count:>6,}` {name}" for _, name, count in stats["top_authors"]
+    ) or "*None*"
+    embed.add_field(name="👥 TOP AUTHORS", value=authors_text, inline=True)
+
+    channels_text = "\n".join(
+        f"`{count:>6,}` <#{channel_id}>" for channel_id, count in stats["top_channels"]
+    ) or "*None*"
+    embed.add_field(name="📁 BUSIEST CHANNELS", value=channels_text, inline=True)
+
+    leaders_text = "\n".join(
+        f"`{count:>6,}` {name}" for _, name, count in stats["reaction_leaders"]
+    ) or "*No reactions yet*"
+    embed.add_field(name="😊 MOST REACTED AUTHORS", value=leaders_text, inline=True)
+
+    if stats["top_messages"]:
+        messages_text = "\n".join(
+            f"`{count:>4}` [message](https://discord.com/channels/{interaction.guild.id}/{channel_id}/{message_id}) by {name}"
+            for message_id, channel_id, name, count in stats["top_messages"]
+        )
+        embed.add_field(name="🏆 MOST REACTED MESSAGES", value=messages_text, inline=False)
+
+    a50, a90, a99 = stats["messages_per_author_pcts"]
+    r50, r90, r99 = stats["reactions_per_message_pcts"]
+    embed.add_field(
+        name="📈 PERCENTILES (p50 / p90 / p99)",
+        value=f"Messages per author: {a50} / {a90} / {a99}\nReactions per message: {r50} / {r90} / {r99}",
+        inline=False
+    )
+
+    embed.set_footer(text=f"Computed in {stats['total_seconds'] * 1000:.0f} ms")
+    await interaction.followup.send(embed=embed)
+
+
 @bot.event
 async def on_message_delete(message):
     if message.author.bot:
@@ -447,7 +879,7 @@ async def on_message_delete(message):
         return 
     print(f" deleted : '{message.content[:30]}...' by {message.author}")
     
-    delete_message(message.id)
+    ingest.submit_delete(message.id, message.guild.id)
 
 
 @bot.event
@@ -467,7 +899,45 @@ async def on_bulk_message_delete(messages):
     message_ids = [m.id for m in guild_messages]
     print(f"🗑️ Bulk delete: {len(message_ids)} messages")
     
-    bulk_delete_messages(message_ids)
+    ingest.submit_bulk_delete(message_ids, guild_messages[0].guild.id)
+
+
+# ===== Raw fallbacks for messages outside the message cache =====
+# on_message_edit/on_message_delete only fire for cached messages. With a small
+# cache (lean profile) most buffered messages aren't cached, so handle the rest here.
+
+@bot.event
+async def on_raw_message_edit(payload):
+    if payload.cached_message is not None or not payload.guild_id:
+        return  # handled by on_message_edit
+
+    message = payload.message
+    if message.author.bot:
+        return
+
+    ingest.submit_update(message)
+
+
+@bot.event
+async def on_raw_message_delete(payload):
+    if payload.cached_message is not None or not payload.guild_id:
+        return  # handled by on_message_delete
+
+    ingest.submit_delete(payload.message_id, payload.guild_id)
+
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    if not payload.guild_id:
+        return
+
+    cached_ids = {m.id for m in payload.cached_messages}
+    uncached_ids = [mid for mid in payload.message_ids if mid not in cached_ids]
+    if not uncached_ids:
+        return  # handled by on_bulk_message_delete
+
+    print(f"🗑️ Bulk delete (uncached): {len(uncached_ids)} messages")
+    ingest.submit_bulk_delete(uncached_ids, payload.guild_id)
 
 
 @bot.event
@@ -486,25 +956,11 @@ async def on_reaction_add(reaction, user):
     if not message.guild:
         return
     
-    # Check if message exists in our database
-    if not message_exists(message.id):
-        return
-    
     # Build reactions data from current message state
-    reactions_data = []
-    total_count = 0
-    
-    for r in message.reactions:
-        emoji_str = str(r.emoji)
-        reactions_data.append({
-            "emoji": emoji_str,
-            "count": r.count,
-            "is_custom": r.is_custom_emoji()
-        })
-        total_count += r.count
-    
-    # Update database
-    update_reactions(message.id, reactions_data, total_count)
+    reactions_data, total_count = reactions_to_data(message)
+    
+    # Update database (a no-op if the message isn't buffered)
+    ingest.submit_reactions(message.id, message.guild.id, reactions_data, total_count)
     print(f"➕ Reaction added: {reaction.emoji} on message {message.id}")
 
 
@@ -524,27 +980,59 @@ async def on_reaction_remove(reaction, user):
     if not message.guild:
         return
     
-    # Check if message exists in our database
-    if not message_exists(message.id):
-        return
-    
     # Build reactions data from current message state
-    reactions_data = []
-    total_count = 0
-    
-    for r in message.reactions:
-        emoji_str = str(r.emoji)
-        reactions_data.append({
-            "emoji": emoji_str,
-            "count": r.count,
-            "is_custom": r.is_custom_emoji()
-        })
-        total_count += r.count
-    
-    # Update database
-    update_reactions(message.id, reactions_data, total_count)
+    reactions_data, total_count = reactions_to_data(message)
+    
+    # Update database (a no-op if the message isn't buffered)
+    ingest.submit_reactions(message.id, message.guild.id, reactions_data, total_count)
     print(f"➖ Reaction removed: {reaction.emoji} on message {message.id}")
 
+
+# ===== Raw fallbacks for reactions on messages outside the message cache =====
+# on_reaction_add/on_reaction_remove only fire for cached messages, so for the
+# rest the stored snapshot is adjusted by message_id. Counts include bot
+# reactions, like reactions_to_data.
+
+def is_cached_message(message_id) -> bool:
+    # Linear scan, but the cache is bounded by MESSAGE_CACHE_SIZE
+    return discord.utils.get(bot.cached_messages, id=message_id) is not None
+
+
+@bot.event
+async def on_raw_reaction_add(payload):
+    if not payload.guild_id or is_cached_message(payload.message_id):
+        return  # handled by on_reaction_add
+
+    ingest.submit_reaction_delta(
+        payload.message_id, payload.guild_id, str(payload.emoji), payload.emoji.is_custom_emoji(), 1
+    )
+
+
+@bot.event
+async def on_raw_reaction_remove(payload):
+    if not payload.guild_id or is_cached_message(payload.message_id):
+        return  # handled by on_reaction_remove
+
+    ingest.submit_reaction_delta(
+        payload.message_id, payload.guild_id, str(payload.emoji), payload.emoji.is_custom_emoji(), -1
+    )
+
+
+@bot.event
+async def on_raw_reaction_clear(payload):
+    # No cached counterpart is handled, so cover every message here
+    if payload.guild_id:
+        ingest.submit_reactions(payload.message_id, payload.guild_id, [], 0)
+
+
+@bot.event
+async def on_raw_reaction_clear_emoji(payload):
+    if payload.guild_id:
+        ingest.submit_reaction_delta(
+            payload.message_id, payload.guild_id, str(payload.emoji), payload.emoji.is_custom_emoji(), None
+        )
+
+
 #modal define here practice 
 class MyModal(discord.ui.Modal, title="simple input"):
 
@@ -602,11 +1090,12 @@ async def info(ctx):
 @bot.command(name="stats")
 async def stats(ctx):
     
-    from services.buffer_service import get_messages
-    
-    # Get message count from database (limit high to get count)
-    messages = get_messages(guild_id=ctx.guild.id, limit=1000)
-    count = len(messages)
+    # COUNT in SQL rather than loading rows
+    try:
+        count = await run_db(count_messages, guild_id=ctx.guild.id)
+    except TimeoutError:
+        await ctx.send(DB_BUSY_MESSAGE)
+        return
     
     await ctx.send(
         f"📊 **Buffer Statistics**\n"
@@ -616,6 +1105,166 @@ async def stats(ctx):
     )
 
 
+@bot.command(name="ingest")
+@commands.check_any(commands.is_owner(), commands.has_permissions(manage_guild=True))
+async def ingest_stats(ctx):
+    """Show ingest pipeline health for this guild (and the busiest ones, for the bot owner)"""
+    m = ingest.snapshot(guild_id=ctx.guild.id)
+    state = "🟠 spilling to disk" if m["spilling"] else "🟢 live"
+    spill_limit = (
+        f"{m['spill_bytes'] / 1024:.1f} KB / {m['spill_soft_limit_bytes'] / (1024 * 1024):.0f} MB soft limit"
+    )
+    if m["spill_bytes"] >= m["spill_soft_limit_bytes"]:
+        spill_limit += " ⚠️ over, shedding reaction updates"
+
+    lines = [
+        f"📥 **Ingest Pipeline** ({state})",
+        f"Queue: {m['queue_depth']}/{m['queue_size']} • Spill log: {spill_limit} "
+        f"• Spilling guilds: {m['spilling_guilds']}",
+        f"Submitted: {m['submitted']} • Written: {m['written']} in {m['batches']} batches",
+        f"Spilled: {m['spilled']} • Replayed: {m['replayed']} (deduplicated {m['deduplicated']})",
+        f"Shed: {m['shed']} • Failed: {m['failed']} • Spill episodes: {m['spill_episodes']}",
+        f"Write lag: p50 {m['lag_p50_ms']:.1f}ms • p95 {m['lag_p95_ms']:.1f}ms",
+    ]
+
+    guild_rows = [("This server", m["guild"])] if "guild" in m else []
+    if await bot.is_owner(ctx.author):
+        guild_rows += [(str(g["guild_id"]), g) for g in m["busiest"]]
+    if guild_rows:
+        lines.append("```")
+        lines.append(f"{'guild':<20}{'queue':>7}{'lag p95':>10}{'spilled':>9}{'weight':>8}")
+        for label, g in guild_rows:
+            flag = "*" if g["spilling"] else ""
+            lines.append(
+                f"{label[:19] + flag:<20}{g['queue_depth']:>7}{g['lag_p95_ms']:>8.1f}ms"
+                f"{g['spilled']:>9}{g['weight']:>8g}"
+            )
+        lines.append("```")
+
+    await ctx.send("\n".join(lines))
+
+
+@bot.command(name="backfill")
+@commands.has_permissions(manage_guild=True)
+async def backfill_command(ctx, action: str = "status"):
+    """Start (`!backfill start`) or show (`!backfill`) the history backfill of this server"""
+    if action == "start":
+        if backfill.start_guild(ctx.guild):
+            await ctx.send("📚 Backfill started - it resumes from saved progress and yields to live messages")
+        else:
+            await ctx.send("⏭️ Backfill is already running for this server")
+        return
+
+    m = backfill.snapshot(guild_id=ctx.guild.id)
+    g = m.get("guild")
+    if g is None:
+        await ctx.send("📚 No backfill has run for this server since startup (`!backfill start`)")
+        return
+
+    await ctx.send("\n".join([
+        f"📚 **History Backfill** ({g['state']})",
+        f"Channels: {g['channels_done']}/{g['channels']} complete",
+        f"Fetched: {g['fetched']} • Written: {g['written']} in {g['batches']} batches",
+        f"Throughput: {g['messages_per_sec']:.1f} msg/s overall • "
+        f"{g['write_messages_per_sec']:.0f} msg/s while writing",
+        f"Elapsed: {g['elapsed_s']:.0f}s • Paused for live ingest: {g['paused_seconds']:.0f}s",
+    ]))
+
+
+@bot.command(name="reconcile")
+@commands.check_any(commands.is_owner(), commands.has_permissions(manage_guild=True))
+async def reconcile_status(ctx):
+    """Show the periodic reconciler's schedule, budget and results"""
+    # Channels of other servers are only listed for the bot owner
+    channel_ids = None
+    if not await bot.is_owner(ctx.author):
+        channel_ids = {c.id for c in ctx.guild.channels} | {t.id for t in ctx.guild.threads}
+    m = reconciler.snapshot(channel_ids=channel_ids)
+    state = "⏸️ paused (ingest lagging)" if m["paused"] else ("🟢 running" if m["running"] else "⚪ stopped")
+
+    lines = [
+        f"🔍 **Periodic Reconciliation** ({state})",
+        f"Channels scheduled: {m['channels']} • Due now: {m['due_now']} • "
+        f"API budget: {m['tokens']:.1f}/{reconciler.api_budget:g} per min",
+        f"Visits: {m['visits']} • Added: {m['added']} • Deleted: {m['deleted']}",
+        f"Paused for ingest: {m['paused_seconds']:.0f}s • Waited for budget: {m['budget_wait_seconds']:.0f}s",
+    ]
+    if m["busiest"]:
+        lines.append("```")
+        lines.append(f"{'channel':<22}{'msg/min':>9}{'revisit':>10}")
+        for c in m["busiest"]:
+            channel = bot.get_channel(c["channel_id"])
+            name = f"#{channel.name}" if channel else str(c["channel_id"])
+            lines.append(f"{name[:21]:<22}{c['rate_per_min']:>9.1f}{c['interval_s'] / 60:>8.0f}m")
+        lines.append("```")
+
+    await ctx.send("\n".join(lines))
+
+
+@bot.command(name="db")
+@commands.is_owner()
+async def db_status(ctx):
+    """Show connection pool usage, DB executor load and read replica health (bot owner only)"""
+    status = pool_status()
+    executor = db_executor.snapshot()
+    primary = status["primary"]
+
+    lines = [
+        "🗄️ **Database Pools**",
+        f"Primary: {primary['checked_out']}/{primary['size']} checked out • overflow {primary['overflow']}",
+    ]
+    for replica in status["replicas"]:
+        state = "🟢" if replica["healthy"] else "🔴"
+        lag = f"{replica['lag']:.1f}s" if replica["lag"] is not None else "n/a"
+        lines.append(
+            f"{state} Replica {replica['name']}: lag {lag} • "
+            f"{replica['checked_out']}/{replica['size']} checked out • overflow {replica['overflow']}"
+        )
+    if not status["replicas"]:
+        lines.append("No read replicas configured, reads use the primary")
+
+    timeout = f"{executor['timeout']:.0f}s" if executor["timeout"] else "none"
+    lines += [
+        f"Executor: {executor['running']}/{executor['workers'] or '-'} busy • {executor['queued']} queued "
+        f"(max {executor['max_queued']}) • timeout {timeout}",
+        f"Queue wait: p50 {executor['wait_p50_ms']:.1f}ms • p95 {executor['wait_p95_ms']:.1f}ms • "
+        f"max {executor['wait_max_ms']:.1f}ms • run p95 {executor['run_p95_ms']:.1f}ms",
+        f"Calls: {executor['calls']} • errors {executor['errors']} • timeouts {executor['timeouts']} "
+        f"({executor['abandoned']} still running when abandoned)",
+    ]
+
+    await ctx.send("\n".join(lines))
+
+
+@bot.command(name="memory")
+@commands.check_any(commands.is_owner(), commands.has_permissions(manage_guild=True))
+async def memory(ctx):
+    """Show resident memory and how much this guild (every guild, for the bot owner) keeps cached"""
+    report = guild_cache_report(bot, guild_id=ctx.guild.id)
+    # Other servers' names and sizes are only shown to the bot owner
+    rows = report["guilds"] if await bot.is_owner(ctx.author) else [report["guild"]]
+    rss_mb = report["rss_bytes"] / (1024 * 1024)
+    per_guild_mb = rss_mb / max(1, report["guild_count"])
+
+    lines = [
+        f"🧠 **Memory Report** (cache profile: `{CACHE_PROFILE}`)",
+        f"RSS: {rss_mb:.1f} MB • Guilds: {report['guild_count']} • {per_guild_mb:.2f} MB/guild avg",
+        f"Cached messages: {report['cached_messages']}",
+        "```",
+        f"{'guild':<24}{'members':>10}{'chan':>6}{'msgs':>6}{'~MB':>8}",
+    ]
+    for row in rows:
+        name = row["guild"].name[:22]
+        members = f"{row['members']}/{row['member_count']}"
+        lines.append(
+            f"{name:<24}{members:>10}{row['channels']:>6}{row['messages']:>6}"
+            f"{row['est_rss_bytes'] / (1024 * 1024):>8.1f}"
+        )
+    lines.append("```")
+
+    await ctx.send("\n".join(lines))
+
+
 @bot.command(name="roll")
 async def roll(ctx, sides: int = 6):
    
@@ -626,7 +1275,14 @@ async def roll(ctx, sides: int = 6):
 
 # Bot start 
 if __name__ == "__main__":
+    validate_config()
     print("🔄 Starting Discord Bot...")
-    bot.run(DISCORD_TOKEN)
+    try:
+        bot.run(DISCORD_TOKEN)
+    finally:
+        ingest.close()
+        db_executor.shutdown()
+        if event_recorder:
+            event_recorder.close()
 
 
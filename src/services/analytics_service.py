@@ -0,0 +1,137 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from services.buffer_service import get_activity_aggregates
+
+HOURS_PER_WEEK = 24 * 7
+
+# Unix epoch (1970-01-01) was a Thursday; shift so bin 0 is Monday 00:00 UTC
+EPOCH_WEEKDAY_OFFSET = 3 * 24
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+HEAT_CHARS = " ░▒▓█"
+
+
+def weighted_percentiles(values, weights, percentiles):
+    """
+    Percentiles of a distribution given as (value, count) pairs.
+
+    Args:
+        values: Distinct values (any order)
+        weights: How many times each value occurs
+        percentiles: Percentiles to compute (0-100)
+
+    Returns:
+        np.ndarray: One value per requested percentile
+    """
+    if len(values) == 0:
+        return np.zeros(len(percentiles))
+
+    order = np.argsort(values)
+    values = np.asarray(values)[order]
+    cumulative = np.cumsum(np.asarray(weights)[order])
+    ranks = np.ceil(np.asarray(percentiles) / 100 * cumulative[-1]).clip(min=1)
+    return values[np.searchsorted(cumulative, ranks)]
+
+
+def top_k(counts, k):
+    """Indices of the k largest counts, largest first (argpartition, no full sort)"""
+    if len(counts) <= k:
+        return np.argsort(counts)[::-1]
+    idx = np.argpartition(counts, -k)[-k:]
+    return idx[np.argsort(counts[idx])[::-1]]
+
+
+def compute_guild_analytics(guild_id, days=30, top=5):
+    """
+    Activity analytics for a guild over the last `days` days.
+
+    Grouped counts come from SQL (see ``get_activity_aggregates``); everything
+    else is vectorized NumPy over those arrays.
+
+    Returns:
+        dict or None: heatmap (7x24 array), totals, top authors/channels,
+        reaction leaderboard, percentiles and timing
+    """
+    started = time.perf_counter()
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+
+    data = get_activity_aggregates(guild_id, since=since, top_messages=top)
+    if data is None:
+        return None
+    query_seconds = time.perf_counter() - started
+
+    # Hour-of-week heatmap: fold absolute hours onto a 168-bin week
+    if data["hours"]:
+        hours = np.array(data["hours"], dtype=np.int64)
+        hour_of_week = (hours[:, 0] + EPOCH_WEEKDAY_OFFSET) % HOURS_PER_WEEK
+        heatmap = np.bincount(hour_of_week, weights=hours[:, 1], minlength=HOURS_PER_WEEK).reshape(7, 24)
+    else:
+        heatmap = np.zeros((7, 24))
+
+    total_messages = int(heatmap.sum())
+
+    # Authors: message counts and reactions received
+    author_ids = np.array([a[0] for a in data["authors"]], dtype=np.int64)
+    author_names = [a[1] for a in data["authors"]]
+    author_messages = np.array([a[2] for a in data["authors"]], dtype=np.int64)
+    author_reactions = np.array([a[3] for a in data["authors"]], dtype=np.int64)
+
+    top_authors = [
+        (int(author_ids[i]), author_names[i], int(author_messages[i]))
+        for i in top_k(author_messages, top)
+    ]
+    reaction_leaders = [
+        (int(author_ids[i]), author_names[i], int(author_reactions[i]))
+        for i in top_k(author_reactions, top)
+        if author_reactions[i] > 0
+    ]
+
+    # Channels
+    channel_ids = np.array([c[0] for c in data["channels"]], dtype=np.int64)
+    channel_messages = np.array([c[1] for c in data["channels"]], dtype=np.int64)
+    top_channels = [
+        (int(channel_ids[i]), int(channel_messages[i]))
+        for i in top_k(channel_messages, top)
+    ]
+
+    # Percentiles: messages per author, reactions per message
+    author_pcts = weighted_percentiles(author_messages, np.ones_like(author_messages), [50, 90, 99])
+    reaction_hist = np.array(data["reaction_hist"], dtype=np.int64).reshape(-1, 2)
+    reaction_pcts = weighted_percentiles(reaction_hist[:, 0], reaction_hist[:, 1], [50, 90, 99])
+
+    busiest = np.unravel_index(np.argmax(heatmap), heatmap.shape) if total_messages else None
+
+    return {
+        "days": days,
+        "total_messages": total_messages,
+        "active_authors": len(author_ids),
+        "active_channels": len(channel_ids),
+        "total_reactions": int(author_reactions.sum()),
+        "heatmap": heatmap,
+        "busiest_slot": (WEEKDAYS[busiest[0]], int(busiest[1])) if busiest else None,
+        "top_authors": top_authors,
+        "top_channels": top_channels,
+        "reaction_leaders": reaction_leaders,
+        "top_messages": [tuple(m) for m in data["top_messages"]],
+        "messages_per_author_pcts": author_pcts.astype(int).tolist(),
+        "reactions_per_message_pcts": reaction_pcts.astype(int).tolist(),
+        "query_seconds": query_seconds,
+        "total_seconds": time.perf_counter() - started,
+    }
+
+
+def render_heatmap(heatmap):
+    """Render a 7x24 heatmap as text rows (one per weekday, one character per hour)"""
+    peak = heatmap.max()
+    if peak == 0:
+        levels = np.zeros(heatmap.shape, dtype=int)
+    else:
+        levels = np.ceil(heatmap / peak * (len(HEAT_CHARS) - 1)).astype(int)
+
+    lines = ["    0   4   8   12  16  20"]
+    for day, row in zip(WEEKDAYS, levels):
+        lines.append(f"{day} " + "".join(HEAT_CHARS[level] for level in row))
+    return "\n".join(lines)
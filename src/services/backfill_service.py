@@ -0,0 +1,263 @@
+import asyncio
+import time
+
+import discord
+
+from services.buffer_service import apply_write_ops, get_backfill_cursors, message_to_data, reactions_to_data
+from services.db_executor import run_db
+from services.ingest_service import is_connection_error
+
+
+class BackfillRunner:
+    """
+    Streams the full history of a guild's text channels and active threads
+    into the database, newest to oldest.
+
+    Fetching and writing are pipelined: channel fetchers page through history
+    and put batches on a small bounded queue while a single writer commits
+    them, so API round trips and DB transactions overlap. Each batch is
+    committed together with its channel's cursor (the oldest message ID
+    fetched), so an interrupted backfill resumes exactly where it stopped.
+
+    Backfill runs below live ingest: the writer waits while the ingest
+    pipeline has a backlog, is spilling, or the database is down.
+    """
+
+    def __init__(
+        self,
+        ingest,
+        concurrency: int = 2,
+        batch_size: int = 500,
+        queue_pages: int = 4,
+        pause_depth: int = 100,
+        pause_interval: float = 1.0,
+        retry_interval: float = 5.0,
+    ):
+        """
+        Args:
+            ingest: The live IngestPipeline backfill must yield to
+            concurrency: Channels fetched at the same time
+            batch_size: Messages per DB transaction
+            queue_pages: Batches buffered between fetchers and the writer
+            pause_depth: Ingest queue depth above which backfill writes wait
+            pause_interval: Seconds between checks while waiting for ingest
+            retry_interval: Seconds between retries while the DB is unreachable
+        """
+        self.ingest = ingest
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.queue_pages = queue_pages
+        self.pause_depth = pause_depth
+        self.pause_interval = pause_interval
+        self.retry_interval = retry_interval
+        self.tasks = {}
+        self.guilds = {}
+
+    def start_guild(self, guild: discord.Guild) -> bool:
+        """
+        Start backfilling a guild in the background (no-op if already running).
+
+        Returns:
+            bool: True if a new backfill was started
+        """
+        running = self.tasks.get(guild.id)
+        if running and not running.done():
+            return False
+
+        self.tasks[guild.id] = asyncio.create_task(self._backfill_guild(guild), name=f"backfill-{guild.id}")
+        return True
+
+    # ===== Fetching =====
+
+    async def _channels(self, guild: discord.Guild):
+        """Readable text channels plus active threads"""
+        channels = list(guild.text_channels)
+        try:
+            channels += await guild.active_threads()
+        except discord.HTTPException as e:
+            print(f"⚠️ Could not list active threads in {guild.name}: {e}")
+
+        readable = []
+        for channel in channels:
+            permissions = channel.permissions_for(guild.me)
+            if permissions.view_channel and permissions.read_message_history:
+                readable.append(channel)
+        return readable
+
+    async def _fetch_channel(self, channel, cursor, pages: asyncio.Queue, stats: dict):
+        before_id = cursor["before_id"] if cursor else None
+        fetched = cursor["messages"] if cursor else 0
+        before = discord.Object(id=before_id) if before_id else None
+
+        batch = []
+        in_batch = 0
+
+        def page(completed):
+            return channel, batch, {
+                "channel_id": channel.id,
+                "guild_id": channel.guild.id,
+                "before_id": before_id,
+                "completed": completed,
+                "messages": fetched,
+            }
+
+        try:
+            async for message in channel.history(limit=None, before=before):
+                before_id = message.id
+                fetched += 1
+                in_batch += 1
+                stats["fetched"] += 1
+
+                # Bot messages are skipped, but still move the cursor
+                if not message.author.bot:
+                    data = message_to_data(message)
+                    data["reactions_data"], data["reaction_count"] = reactions_to_data(message)
+                    batch.append(data)
+
+                if in_batch >= self.batch_size:
+                    await pages.put(page(False))
+                    batch = []
+                    in_batch = 0
+
+            await pages.put(page(True))
+
+        except discord.Forbidden:
+            print(f"    ⚠️ No permission to read #{channel.name}, skipping backfill")
+        except discord.HTTPException as e:
+            # Whatever was queued is kept; the next run resumes from the cursor
+            print(f"    ❌ Backfill of #{channel.name} stopped: {e}")
+
+    # ===== Writing =====
+
+    async def _wait_for_ingest(self, stats: dict):
+        """Hold backfill writes while live ingest needs the database"""
+        ingest = self.ingest
+        started = None
+        while ingest.db_down or ingest.spilling or ingest.scheduler.total > self.pause_depth:
+            if started is None:
+                started = time.perf_counter()
+            await asyncio.sleep(self.pause_interval)
+        if started is not None:
+            stats["paused_seconds"] += time.perf_counter() - started
+
+    async def _apply(self, ops):
+        # Pages may overlap live saves; save_many skips messages already stored
+        while True:
+            try:
+                await run_db(apply_write_ops, ops, timeout=None)
+                return
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                print(f"⚠️ Database unavailable during backfill, retrying in {self.retry_interval:.0f}s")
+                await asyncio.sleep(self.retry_interval)
+
+    async def _write_pages(self, pages: asyncio.Queue, stats: dict):
+        while True:
+            page = await pages.get()
+            if page is None:
+                return
+
+            channel, messages, cursor = page
+            await self._wait_for_ingest(stats)
+
+            started = time.perf_counter()
+            ops = [["save_many", messages]] if messages else []
+            ops.append(["backfill_cursor", cursor])
+            await self._apply(ops)
+
+            stats["write_seconds"] += time.perf_counter() - started
+            stats["written"] += len(messages)
+            stats["batches"] += 1
+            if cursor["completed"]:
+                stats["channels_done"] += 1
+                print(f"    ✅ #{channel.name}: {cursor['messages']} messages backfilled")
+
+    # ===== Orchestration =====
+
+    async def _backfill_guild(self, guild: discord.Guild):
+        stats = self.guilds[guild.id] = {
+            "guild_id": guild.id,
+            "state": "running",
+            "channels": 0,
+            "channels_done": 0,
+            "fetched": 0,
+            "written": 0,
+            "batches": 0,
+            "write_seconds": 0.0,
+            "paused_seconds": 0.0,
+            "started": time.perf_counter(),
+            "finished": None,
+        }
+
+        try:
+            cursors = await run_db(get_backfill_cursors, guild.id)
+            channels = [
+                c for c in await self._channels(guild)
+                if not cursors.get(c.id, {}).get("completed")
+            ]
+            stats["channels"] = len(channels)
+            print(f"\n📚 Backfilling {guild.name}: {len(channels)} channel(s)/thread(s) to go")
+
+            pages = asyncio.Queue(maxsize=self.queue_pages)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(channel):
+                async with semaphore:
+                    await self._fetch_channel(channel, cursors.get(channel.id), pages, stats)
+
+            writer = asyncio.create_task(self._write_pages(pages, stats))
+            fetchers = asyncio.gather(*(fetch(c) for c in channels))
+            try:
+                await asyncio.wait([fetchers, writer], return_when=asyncio.FIRST_COMPLETED)
+                if writer.done():
+                    # The writer only stops early when it failed
+                    writer.result()
+                await fetchers
+                await pages.put(None)
+                await writer
+            finally:
+                fetchers.cancel()
+                writer.cancel()
+
+            stats["state"] = "done"
+
+        except asyncio.CancelledError:
+            stats["state"] = "stopped"
+            raise
+        except Exception as e:
+            stats["state"] = "failed"
+            print(f"❌ Backfill of {guild.name} failed (resumes from its cursors next run): {e}")
+        finally:
+            stats["finished"] = time.perf_counter()
+
+        m = self.guild_snapshot(stats)
+        print(f"📚 Backfill of {guild.name} {m['state']}: {m['written']} messages written "
+              f"in {m['elapsed_s']:.1f}s ({m['messages_per_sec']:.1f} msg/s, "
+              f"paused {m['paused_seconds']:.1f}s for live ingest)")
+
+    # ===== Metrics =====
+
+    def guild_snapshot(self, stats: dict) -> dict:
+        end = stats["finished"] or time.perf_counter()
+        elapsed = end - stats["started"]
+        return {
+            **{k: v for k, v in stats.items() if k not in ("started", "finished")},
+            "elapsed_s": elapsed,
+            "messages_per_sec": stats["fetched"] / elapsed if elapsed > 0 else 0.0,
+            "write_messages_per_sec": stats["written"] / stats["write_seconds"] if stats["write_seconds"] > 0 else 0.0,
+        }
+
+    def snapshot(self, guild_id=None) -> dict:
+        """Throughput and progress of every backfill run by this process"""
+        guilds = [self.guild_snapshot(stats) for stats in self.guilds.values()]
+        snapshot = {
+            "running": sum(1 for g in guilds if g["state"] == "running"),
+            "fetched": sum(g["fetched"] for g in guilds),
+            "written": sum(g["written"] for g in guilds),
+            "messages_per_sec": sum(g["messages_per_sec"] for g in guilds if g["state"] == "running"),
+            "guilds": guilds,
+        }
+        if guild_id in self.guilds:
+            snapshot["guild"] = self.guild_snapshot(self.guilds[guild_id])
+        return snapshot
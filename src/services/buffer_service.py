@@ -1,9 +1,91 @@
 
-from database.models import Message
-from database.connection import SessionLocal
-from datetime import datetime
+import hashlib
+import json
+from sqlalchemy import text, func, or_, select, update, delete, bindparam, any_, cast, BigInteger
+from sqlalchemy.dialects import postgresql, sqlite
+from database.models import Message, SearchQuery, BackfillCursor
+# Writes use SessionLocal (primary); read-only queries use ReadSessionLocal,
+# which routes to a healthy read replica when any are configured
+from database.connection import SessionLocal, ReadSessionLocal
+from database.serialization import ReactionData, AttachmentData
+from datetime import datetime, timedelta, timezone
+
+
+def message_to_data(discord_message):
+    """Snapshot a discord.Message into a plain dict of Message columns"""
+    return {
+        "message_id": discord_message.id,
+        "channel_id": discord_message.channel.id,
+        "guild_id": discord_message.guild.id,
+        "author_id": discord_message.author.id,
+        "author_name": str(discord_message.author),
+        "content": discord_message.content,
+        "created_at": discord_message.created_at,
+        "edited_at": discord_message.edited_at,
+        "is_pinned": discord_message.pinned,
+        "has_attachments": len(discord_message.attachments) > 0,
+        "has_embeds": len(discord_message.embeds) > 0,
+        "raw_data": {
+            "jump_url": discord_message.jump_url,
+            "attachments": [
+                AttachmentData(a.id, a.filename, a.url)
+                for a in discord_message.attachments
+            ],
+            "embeds": [e.to_dict() for e in discord_message.embeds]
+        }
+    }
+
+
+def reactions_to_data(discord_message):
+    """
+    Snapshot a message's reactions.
+    
+    Returns:
+        tuple: (reactions_data list, total reaction count)
+    """
+    reactions_data = []
+    total_count = 0
+    
+    for r in discord_message.reactions:
+        reactions_data.append(ReactionData(str(r.emoji), r.count, r.is_custom_emoji()))
+        total_count += r.count
+    
+    return reactions_data, total_count
 
 
+def apply_reaction_delta(reactions_data, emoji, is_custom, delta):
+    """
+    Adjust one emoji in a stored reactions snapshot (for reaction events on
+    messages we don't have in the cache, so there is no full snapshot).
+    
+    Args:
+        reactions_data: Stored reactions (ReactionData or their JSON dicts)
+        emoji: str() of the emoji
+        is_custom: Whether it is a custom emoji
+        delta: +1 / -1, or None to remove the emoji entirely
+    
+    Returns:
+        tuple: (reactions_data list, total reaction count)
+    """
+    updated = []
+    found = False
+    
+    for r in reactions_data or []:
+        if isinstance(r, dict):
+            r = ReactionData(r["emoji"], r["count"], r["is_custom"])
+        if r.emoji == emoji:
+            found = True
+            if delta is None:
+                continue
+            r = ReactionData(r.emoji, r.count + delta, r.is_custom)
+        if r.count > 0:
+            updated.append(r)
+    
+    if not found and delta is not None and delta > 0:
+        updated.append(ReactionData(emoji, delta, is_custom))
+    
+    return updated, sum(r.count for r in updated)
+
 
 def save_message(discord_message):
     
@@ -20,27 +102,7 @@ def save_message(discord_message):
             return existing
         
         # Create new message object
-        db_message = Message(
-            message_id=discord_message.id,
-            channel_id=discord_message.channel.id,
-            guild_id=discord_message.guild.id,
-            author_id=discord_message.author.id,
-            author_name=str(discord_message.author),
-            content=discord_message.content,
-            created_at=discord_message.created_at,
-            is_pinned=discord_message.pinned,
-            has_attachments=len(discord_message.attachments) > 0,
-            has_embeds=len(discord_message.embeds) > 0,
-            reaction_count=0,
-            raw_data={
-                "jump_url": discord_message.jump_url,
-                "attachments": [
-                    {"id": a.id, "filename": a.filename, "url": a.url}
-                    for a in discord_message.attachments
-                ],
-                "embeds": [e.to_dict() for e in discord_message.embeds]
-            }
-        )
+        db_message = Message(**message_to_data(discord_message), reaction_count=0)
         
         # Add to session and save to database
         db.add(db_message)
@@ -110,48 +172,446 @@ def delete_message(message_id):
     finally:
         db.close()
 
+# Discord snowflakes: ms since the Discord epoch, shifted left 22 bits
+DISCORD_EPOCH_MS = 1420070400000
+SNOWFLAKE_TIMESTAMP_SHIFT = 4194304  # 2 ** 22
+
+
+def snowflake_from_datetime(dt, high=False):
+    """
+    Smallest (or with high=True, largest) message ID that can be created at `dt`.
+    
+    Date-range filters are turned into message_id ranges with this, so they
+    use the primary key instead of an index on created_at. Naive datetimes
+    are treated as UTC.
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    ms = int(dt.timestamp() * 1000) - DISCORD_EPOCH_MS
+    snowflake = max(ms, 0) * SNOWFLAKE_TIMESTAMP_SHIFT
+    if high:
+        snowflake += SNOWFLAKE_TIMESTAMP_SHIFT - 1
+    return snowflake
+
+
+def filter_messages(query, guild_id=None, channel_id=None, author_id=None, from_date=None, to_date=None, has_attachments=None,
+                    channel_ids=None, author_ids=None, has_reactions=None):
+    """Apply the standard message filters (shared by get_messages, iter_messages and search pages)"""
+    query = query.filter(Message.guild_id == guild_id)
+
+    if channel_id:
+        query = query.filter(Message.channel_id == channel_id)
+
+    if channel_ids:
+        query = query.filter(Message.channel_id.in_(channel_ids))
+
+    if author_id:
+        query = query.filter(Message.author_id == author_id)
+
+    if author_ids:
+        query = query.filter(Message.author_id.in_(author_ids))
+
+    # Message IDs are time-ordered, so date bounds become ID bounds
+    if from_date:
+        query = query.filter(Message.message_id >= snowflake_from_datetime(from_date))
+
+    if to_date: 
+        query = query.filter(Message.message_id <= snowflake_from_datetime(to_date, high=True))
+
+    if has_attachments:
+        query = query.filter(Message.has_attachments == True)
+
+    if has_reactions is True:
+        query = query.filter(Message.reaction_count > 0)
+    elif has_reactions is False:
+        query = query.filter(or_(Message.reaction_count == 0, Message.reaction_count.is_(None)))
+
+    return query
+
+
 def get_messages(guild_id=None, channel_id=None, author_id=None, from_date=None, to_date=None, has_attachments=None, limit=20):
     """Get messages with optional filters"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
 
     try:
-        query = db.query(Message).filter(
-            Message.guild_id == guild_id
+        query = filter_messages(
+            db.query(Message),
+            guild_id=guild_id,
+            channel_id=channel_id,
+            author_id=author_id,
+            from_date=from_date,
+            to_date=to_date,
+            has_attachments=has_attachments
         )
+
+        messages = query.order_by(Message.message_id.desc()).limit(limit).all()
+        return messages
+
+    except Exception as e:
+        print(f"error getting messages: {e}")
+        return []
+
+    finally:
+        db.close()
+
+
+def iter_messages(columns, chunk_size=5000, **filters):
+    """
+    Stream messages matching get_messages-style filters in constant memory.
+    
+    Uses a server-side cursor (stream_results + yield_per), so only
+    `chunk_size` rows are held at a time. Rows come in message_id order.
+    Errors are raised - a half-written export must not look complete.
     
-        if channel_id:
-            query = query.filter(Message.channel_id == channel_id)
+    Args:
+        columns: Message columns to select, e.g. [Message.message_id, Message.content]
+        chunk_size: Rows fetched per round trip
+        **filters: guild_id, channel_id, author_id, from_date, to_date, has_attachments
+    
+    Yields:
+        Row: One row per message
+    """
+    db = ReadSessionLocal()
 
-        if author_id:
-            query = query.filter(Message.author_id == author_id)
+    try:
+        query = filter_messages(db.query(*columns), **filters)
+        query = query.order_by(Message.message_id).execution_options(stream_results=True)
 
-        if from_date:
-            query = query.filter(Message.created_at >= from_date)
+        for row in query.yield_per(chunk_size):
+            yield row
 
-        if to_date: 
-            query = query.filter(Message.created_at <= to_date)
+    finally:
+        db.close()
 
-        if has_attachments:
-            query = query.filter(Message.has_attachments == True)
 
-        messages = query.order_by(Message.created_at.desc()).limit(limit).all()
-        return messages
+def messages_page_statement(filters, before_id=None, after_id=None, limit=5):
+    """The keyset query behind get_messages_page (fetches limit + 1 rows to detect more pages)"""
+    statement = filter_messages(select(Message), **filters)
+
+    if after_id:
+        statement = statement.filter(Message.message_id > after_id).order_by(Message.message_id.asc())
+    else:
+        if before_id:
+            statement = statement.filter(Message.message_id < before_id)
+        statement = statement.order_by(Message.message_id.desc())
+
+    return statement.limit(limit + 1)
+
+
+def get_messages_page(filters, before_id=None, after_id=None, limit=5):
+    """
+    One page of search results using keyset pagination on message_id (newest first).
+    
+    Args:
+        filters: filter_messages keyword arguments
+        before_id: Return the page of messages older than this ID (next page)
+        after_id: Return the page of messages newer than this ID (previous page)
+        limit: Page size
+    
+    Returns:
+        tuple: (messages newest first, True if more messages exist past this page)
+    """
+    db = ReadSessionLocal()
+
+    try:
+        messages = list(db.scalars(messages_page_statement(filters, before_id, after_id, limit)))
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        if after_id:
+            messages.reverse()
+
+        return messages, has_more
 
     except Exception as e:
-        print(f"error getting messages: {e}")
-        return []
+        print(f"error getting messages page: {e}")
+        return [], False
+
+    finally:
+        db.close()
+
+
+def count_messages(**filters):
+    """Count messages matching filter_messages filters"""
+    db = ReadSessionLocal()
+
+    try:
+        return filter_messages(db.query(func.count(Message.message_id)), **filters).scalar()
+    except Exception as e:
+        print(f"error counting messages: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+# Datetime filters are stored as ISO strings in SearchQuery.filters
+SEARCH_DATE_FILTERS = ("from_date", "to_date")
+
+
+def save_search_query(filters, summary=None, total=0):
+    """
+    Persist search filters and return their hash (idempotent).
+    
+    The hash goes into result button custom_ids, so any process can serve
+    page clicks - even after a restart or from another shard.
+    """
+    stored = dict(filters)
+    for key in SEARCH_DATE_FILTERS:
+        if stored.get(key):
+            stored[key] = stored[key].isoformat()
+
+    canonical = json.dumps(stored, sort_keys=True, separators=(",", ":"))
+    query_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    db = SessionLocal()
+
+    try:
+        existing = db.get(SearchQuery, query_hash)
+        if existing:
+            existing.summary = summary
+            existing.total = total
+            existing.created_at = datetime.now(timezone.utc)
+        else:
+            db.add(SearchQuery(
+                query_hash=query_hash,
+                guild_id=filters["guild_id"],
+                filters=stored,
+                summary=summary,
+                total=total
+            ))
+        db.commit()
+        return query_hash
+
+    except Exception as e:
+        print(f"Error saving search query: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def search_query_cutoff(max_age):
+    """Saved searches last run before this are expired"""
+    return datetime.now(timezone.utc) - timedelta(seconds=max_age)
+
+
+def get_search_query(query_hash, max_age=86400):
+    """
+    Load saved search filters.
+    
+    Args:
+        max_age: Seconds since the search was last run before it expires
+    
+    Returns:
+        tuple or None: (filters, summary, total), None if unknown or expired
+    """
+    # Primary, not a replica: the query may have been saved a moment ago
+    db = SessionLocal()
+
+    try:
+        saved = db.scalars(select(SearchQuery).where(
+            SearchQuery.query_hash == query_hash,
+            SearchQuery.created_at >= search_query_cutoff(max_age)
+        )).first()
+        if not saved:
+            return None
 
+        filters = dict(saved.filters)
+        for key in SEARCH_DATE_FILTERS:
+            if filters.get(key):
+                filters[key] = datetime.fromisoformat(filters[key])
+
+        return filters, saved.summary, saved.total
+
+    except Exception as e:
+        print(f"Error loading search query {query_hash}: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def delete_expired_search_queries(max_age=86400):
+    """
+    Delete saved searches not run for ``max_age`` seconds.
+    
+    Returns:
+        int: Number of searches deleted
+    """
+    db = SessionLocal()
+
+    try:
+        result = db.execute(delete(SearchQuery).where(SearchQuery.created_at < search_query_cutoff(max_age)))
+        db.commit()
+        return result.rowcount
+
+    except Exception as e:
+        print(f"Error deleting expired search queries: {e}")
+        db.rollback()
+        return 0
     finally:
         db.close()
 
 
+def get_activity_aggregates(guild_id, since=None, top_messages=5):
+    """
+    Grouped counts for guild analytics.
+    
+    All heavy lifting stays in SQL: each query returns a small grouped result
+    (one row per hour / author / channel / distinct reaction count) that the
+    caller post-processes as arrays. Hours are derived from the snowflake
+    message_id, so no timezone/extract functions are needed.
+    
+    Args:
+        guild_id: Guild to analyse
+        since: Only count messages created at or after this datetime
+        top_messages: How many most-reacted messages to return
+    
+    Returns:
+        dict: hours, authors, channels, reaction_hist and top_messages row lists
+    """
+    db = ReadSessionLocal()
+
+    try:
+        def grouped(*columns):
+            return filter_messages(db.query(*columns), guild_id=guild_id, from_date=since)
+
+        hour = ((Message.message_id // SNOWFLAKE_TIMESTAMP_SHIFT) + DISCORD_EPOCH_MS) // 3600000
+
+        return {
+            # (unix hour, messages)
+            "hours": grouped(hour, func.count()).group_by(hour).all(),
+            # (author_id, author_name, messages, reactions received)
+            "authors": grouped(
+                Message.author_id,
+                func.max(Message.author_name),
+                func.count(),
+                func.coalesce(func.sum(Message.reaction_count), 0)
+            ).group_by(Message.author_id).all(),
+            # (channel_id, messages)
+            "channels": grouped(Message.channel_id, func.count()).group_by(Message.channel_id).all(),
+            # (reaction_count, messages with that many reactions)
+            "reaction_hist": grouped(
+                func.coalesce(Message.reaction_count, 0),
+                func.count()
+            ).group_by(func.coalesce(Message.reaction_count, 0)).all(),
+            "top_messages": grouped(
+                Message.message_id,
+                Message.channel_id,
+                Message.author_name,
+                Message.reaction_count
+            ).filter(Message.reaction_count > 0)
+             .order_by(Message.reaction_count.desc())
+             .limit(top_messages).all(),
+        }
+
+    except Exception as e:
+        print(f"Error getting activity aggregates: {e}")
+        return None
+
+    finally:
+        db.close()
+
+
+# ============= Hot statements =============
+# Built once at import and run with bound parameters, so SQLAlchemy reuses their
+# compiled form. Single-row statements send the same SQL text on every call, so
+# psycopg can prepare them server-side (see DB_PREPARE_THRESHOLD). Batched
+# inserts/upserts are rendered as multi-row VALUES (insertmanyvalues), whose
+# text varies with the batch size.
+
+messages_table = Message.__table__
+
+# Fields refreshed on edit (everything else is fixed at creation)
+UPDATABLE_FIELDS = ("content", "edited_at", "is_pinned", "has_attachments", "has_embeds")
+
+# Optional columns, filled in so every row of an executemany has the same keys
+MESSAGE_ROW_DEFAULTS = {
+    "edited_at": None,
+    "is_pinned": False,
+    "has_attachments": False,
+    "has_embeds": False,
+    "reaction_count": 0,
+    "reactions_data": None,
+    "raw_data": None,
+}
+
+SELECT_MESSAGE = select(Message).where(Message.message_id == bindparam("message_id"))
+
+SELECT_MESSAGE_EXISTS = select(Message.message_id).where(Message.message_id == bindparam("message_id"))
+
+SELECT_CHANNEL_MESSAGE_IDS = (
+    select(Message.message_id)
+    .where(Message.channel_id == bindparam("channel_id"))
+    .order_by(Message.message_id.desc())
+    .limit(bindparam("limit"))
+)
+
+SELECT_CHANNEL_MESSAGE_IDS_SINCE = select(Message.message_id).where(
+    Message.channel_id == bindparam("channel_id"),
+    Message.message_id >= bindparam("min_id")
+)
+
+SELECT_REACTIONS = (
+    select(messages_table.c.reactions_data)
+    .where(messages_table.c.message_id == bindparam("message_id"))
+    .with_for_update()
+)
+
+SELECT_CHANNEL_MESSAGE_IDS_BETWEEN = select(Message.message_id).where(
+    Message.channel_id == bindparam("channel_id"),
+    Message.message_id.between(bindparam("min_id"), bindparam("max_id"))
+)
+
+UPDATE_REACTIONS = (
+    update(messages_table)
+    .where(messages_table.c.message_id == bindparam("b_message_id"))
+    .values(reactions_data=bindparam("b_reactions_data"), reaction_count=bindparam("b_reaction_count"))
+)
+
+
+def _dialect_statements(insert, delete_where):
+    stmt = insert(messages_table)
+    return {
+        # save: keep the first copy of a message
+        "insert": stmt.on_conflict_do_nothing(index_elements=[messages_table.c.message_id]),
+        # update: refresh editable fields, or insert if we never saw the message
+        "upsert": stmt.on_conflict_do_update(
+            index_elements=[messages_table.c.message_id],
+            set_={field: stmt.excluded[field] for field in UPDATABLE_FIELDS}
+        ),
+        "delete": delete(messages_table).where(delete_where),
+    }
+
+
+# Upserts and ID-list deletes are dialect specific. On Postgres the ID list is
+# one array parameter, so the DELETE text doesn't change with the list length.
+DIALECT_STATEMENTS = {
+    "postgresql": _dialect_statements(
+        postgresql.insert,
+        messages_table.c.message_id == any_(cast(bindparam("message_ids"), postgresql.ARRAY(BigInteger)))
+    ),
+    "sqlite": _dialect_statements(
+        sqlite.insert,
+        messages_table.c.message_id.in_(bindparam("message_ids", expanding=True))
+    ),
+}
+
+
+def statements_for(db):
+    """The dialect-specific write statements for a session's database"""
+    name = db.get_bind().dialect.name
+    try:
+        return DIALECT_STATEMENTS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported database dialect: {name}") from None
+
+
 def get_message_by_id(message_id):
     """Get a single message by ID"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     
     try:
-        message = db.query(Message).filter(Message.message_id == message_id).first()
-        return message
+        return db.scalars(SELECT_MESSAGE, {"message_id": message_id}).first()
     except Exception as e:
         print(f"Error getting message {message_id}: {e}")
         return None
@@ -164,15 +624,17 @@ def update_reactions(message_id, reactions_data, reaction_count):
     db = SessionLocal()
     
     try:
-        message = db.query(Message).filter(Message.message_id == message_id).first()
+        result = db.execute(UPDATE_REACTIONS, {
+            "b_message_id": message_id,
+            "b_reactions_data": reactions_data,
+            "b_reaction_count": reaction_count
+        })
         
-        if not message:
+        if result.rowcount == 0:
             print(f"Message {message_id} not found for reaction update")
+            db.rollback()
             return False
         
-        message.reactions_data = reactions_data
-        message.reaction_count = reaction_count
-        
         db.commit()
         print(f"Updated reactions for message {message_id}: {reaction_count} total")
         return True
@@ -193,9 +655,8 @@ def bulk_delete_messages(message_ids):
     db = SessionLocal()
     
     try:
-        deleted_count = db.query(Message).filter(
-            Message.message_id.in_(message_ids)
-        ).delete(synchronize_session=False)
+        result = db.execute(statements_for(db)["delete"], {"message_ids": list(message_ids)})
+        deleted_count = result.rowcount
         
         db.commit()
         print(f"Bulk deleted {deleted_count} messages")
@@ -211,14 +672,10 @@ def bulk_delete_messages(message_ids):
 
 def get_channel_message_ids(channel_id, limit=100):
     """Get message IDs for a channel (used for reconciliation)"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     
     try:
-        messages = db.query(Message.message_id).filter(
-            Message.channel_id == channel_id
-        ).order_by(Message.created_at.desc()).limit(limit).all()
-        
-        return {m.message_id for m in messages}
+        return set(db.scalars(SELECT_CHANNEL_MESSAGE_IDS, {"channel_id": channel_id, "limit": limit}))
         
     except Exception as e:
         print(f"Error getting channel message IDs: {e}")
@@ -227,15 +684,202 @@ def get_channel_message_ids(channel_id, limit=100):
         db.close()
 
 
+def get_channel_message_ids_since(channel_id, since):
+    """Get message IDs for a channel created at or after `since` (used for gap reconciliation)"""
+    db = ReadSessionLocal()
+    
+    try:
+        return set(db.scalars(SELECT_CHANNEL_MESSAGE_IDS_SINCE, {
+            "channel_id": channel_id,
+            "min_id": snowflake_from_datetime(since)
+        }))
+        
+    except Exception as e:
+        print(f"Error getting channel message IDs since {since}: {e}")
+        return set()
+    finally:
+        db.close()
+
+
+def get_channel_message_ids_between(channel_id, min_id, max_id):
+    """Get message IDs for a channel between two message IDs, inclusive (used for reconciliation)"""
+    db = ReadSessionLocal()
+    
+    try:
+        return set(db.scalars(SELECT_CHANNEL_MESSAGE_IDS_BETWEEN, {
+            "channel_id": channel_id,
+            "min_id": min_id,
+            "max_id": max_id
+        }))
+        
+    except Exception as e:
+        print(f"Error getting channel message IDs between {min_id} and {max_id}: {e}")
+        return set()
+    finally:
+        db.close()
+
+
 def message_exists(message_id):
     """Check if a message exists in the database"""
-    db = SessionLocal()
+    db = ReadSessionLocal()
     
     try:
-        exists = db.query(Message).filter(Message.message_id == message_id).first() is not None
-        return exists
+        return db.execute(SELECT_MESSAGE_EXISTS, {"message_id": message_id}).first() is not None
     except Exception as e:
         print(f"Error checking message existence: {e}")
         return False
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Write op kind -> statement it runs; consecutive ops sharing one are batched
+WRITE_OP_STATEMENTS = {
+    "save": "insert",
+    "save_many": "insert",
+    "update": "upsert",
+    "delete": "delete",
+    "bulk_delete": "delete",
+    "reactions": "reactions",
+    "reaction_delta": "reaction_delta",
+    "backfill_cursor": "backfill_cursor",
+}
+
+
+def group_write_ops(ops):
+    """
+    Split write ops into runs of consecutive ops that share a statement.
+    
+    Returns:
+        list: (statement name, list of rows) in the original op order
+    """
+    runs = []
+    for kind, payload in ops:
+        statement = WRITE_OP_STATEMENTS.get(kind)
+        if statement is None:
+            raise ValueError(f"Unknown write op: {kind}")
+        
+        rows = payload if kind in ("save_many", "bulk_delete") else [payload]
+        if runs and runs[-1][0] == statement:
+            runs[-1][1].extend(rows)
+        else:
+            runs.append((statement, list(rows)))
+    return runs
+
+
+def apply_write_ops(ops):
+    """
+    Apply a batch of write operations in a single transaction.
+    
+    Used by the ingest pipeline. Unlike the functions above, errors are
+    raised (after rollback) so the caller can retry or spill the batch.
+    Every operation except reaction_delta is idempotent, so a batch may
+    safely be applied twice (a replayed delta can leave one emoji's count off
+    by one until the next full reactions snapshot).
+    Consecutive ops of the same kind are executed together with a list of rows.
+    
+    Args:
+        ops: List of [kind, payload] where kind is one of
+             "save" (message data), "update" (message data),
+             "delete" (message_id), "bulk_delete" (list of message_ids),
+             "reactions" ({"message_id", "reactions_data", "reaction_count"}),
+             "reaction_delta" ({"message_id", "emoji", "is_custom", "delta"},
+             see apply_reaction_delta),
+             "save_many" (list of message data, may include reactions),
+             "backfill_cursor" (BackfillCursor columns, channel_id required)
+    
+    Returns:
+        int: Number of operations applied
+    """
+    # autoflush so cursor lookups see cursors added earlier in the same batch
+    db = SessionLocal(autoflush=True)
+    
+    try:
+        statements = statements_for(db)
+        
+        for statement, rows in group_write_ops(ops):
+            if statement == "insert":
+                db.execute(statements["insert"], [{**MESSAGE_ROW_DEFAULTS, **row} for row in rows])
+            
+            elif statement == "upsert":
+                # One row per message - a statement can't upsert the same row twice
+                latest = {row["message_id"]: row for row in rows}
+                db.execute(statements["upsert"], [{**MESSAGE_ROW_DEFAULTS, **row} for row in latest.values()])
+            
+            elif statement == "delete":
+                db.execute(statements["delete"], {"message_ids": rows})
+            
+            elif statement == "reactions":
+                db.execute(UPDATE_REACTIONS, [
+                    {
+                        "b_message_id": row["message_id"],
+                        "b_reactions_data": row["reactions_data"],
+                        "b_reaction_count": row["reaction_count"],
+                    }
+                    for row in rows
+                ])
+            
+            elif statement == "reaction_delta":
+                # Read-modify-write, one message at a time so repeated deltas stack
+                for row in rows:
+                    current = db.execute(SELECT_REACTIONS, {"message_id": row["message_id"]}).first()
+                    if current is None:
+                        continue  # Not buffered
+                    reactions_data, reaction_count = apply_reaction_delta(
+                        current.reactions_data, row["emoji"], row["is_custom"], row["delta"]
+                    )
+                    db.execute(UPDATE_REACTIONS, {
+                        "b_message_id": row["message_id"],
+                        "b_reactions_data": reactions_data,
+                        "b_reaction_count": reaction_count,
+                    })
+            
+            elif statement == "backfill_cursor":
+                for payload in rows:
+                    cursor = db.get(BackfillCursor, payload["channel_id"])
+                    if cursor is None:
+                        db.add(BackfillCursor(**payload))
+                    else:
+                        for field, value in payload.items():
+                            setattr(cursor, field, value)
+        
+        db.commit()
+        return len(ops)
+        
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_backfill_cursors(guild_id):
+    """
+    Backfill progress for a guild's channels (read from the primary, as it
+    is written together with each backfilled page).
+    
+    Returns:
+        dict: channel_id -> {"before_id", "completed", "messages"}
+    """
+    db = SessionLocal()
+    
+    try:
+        cursors = db.query(BackfillCursor).filter(BackfillCursor.guild_id == guild_id).all()
+        return {
+            c.channel_id: {"before_id": c.before_id, "completed": c.completed, "messages": c.messages or 0}
+            for c in cursors
+        }
+    finally:
+        db.close()
+
+
+def check_database():
+    """Return True if the database answers a trivial query"""
+    db = SessionLocal()
+    
+    try:
+        db.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+    finally:
+        db.close()
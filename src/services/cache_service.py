@@ -0,0 +1,126 @@
+import os
+import resource
+import sys
+
+import discord
+
+
+def process_rss_bytes():
+    """Current resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No /proc (macOS etc.) - fall back to peak RSS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def build_cache_options(profile, message_cache_size=None, member_cache=None, chunk_at_startup=None):
+    """
+    Build discord.py client cache options for a cache profile.
+    
+    Profiles:
+        default - discord.py defaults (1000 cached messages, all members, chunk at startup)
+        lean    - small message cache, no member cache, no chunking at startup.
+                  Messages already live in Postgres, so we only cache enough to
+                  give edit/delete handlers the "before" copy for recent messages.
+    
+    Args:
+        profile: "default" or "lean"
+        message_cache_size: Override max cached messages (0 disables the cache)
+        member_cache: Override member cache ("all", "joined", "voice" or "none")
+        chunk_at_startup: Override chunking of members at startup
+    
+    Returns:
+        dict: Keyword arguments for ``commands.Bot``
+    """
+    if profile == "lean":
+        options = {
+            "max_messages": 200,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+        }
+    elif profile == "default":
+        options = {
+            "max_messages": 1000,
+            "member_cache_flags": discord.MemberCacheFlags.all(),
+            "chunk_guilds_at_startup": True,
+        }
+    else:
+        raise ValueError(f"Unknown cache profile: {profile}")
+    
+    if message_cache_size is not None:
+        options["max_messages"] = message_cache_size or None
+    
+    if member_cache is not None:
+        flags = {
+            "all": discord.MemberCacheFlags.all,
+            "none": discord.MemberCacheFlags.none,
+            "joined": lambda: discord.MemberCacheFlags(joined=True),
+            "voice": lambda: discord.MemberCacheFlags(voice=True),
+        }
+        if member_cache not in flags:
+            raise ValueError(f"Unknown member cache setting: {member_cache}")
+        options["member_cache_flags"] = flags[member_cache]()
+    
+    if chunk_at_startup is not None:
+        options["chunk_guilds_at_startup"] = chunk_at_startup
+    
+    return options
+
+
+def guild_cache_report(bot, top=10, guild_id=None):
+    """
+    Estimate how the process' resident memory is spread across guilds.
+    
+    discord.py doesn't track memory per object, so each guild's share of RSS is
+    estimated from the number of objects it keeps cached (members, channels,
+    roles, cached messages).
+    
+    Args:
+        bot: The Discord bot instance
+        top: How many guilds to include, largest first
+        guild_id: Also return this guild's row as "guild" (if the bot is in it)
+    
+    Returns:
+        dict: rss_bytes, guild_count, cached_messages and per-guild rows
+    """
+    rss = process_rss_bytes()
+    
+    messages_per_guild = {}
+    for message in bot.cached_messages:
+        if message.guild:
+            messages_per_guild[message.guild.id] = messages_per_guild.get(message.guild.id, 0) + 1
+    
+    rows = []
+    for guild in bot.guilds:
+        cached_members = len(guild.members)
+        cached_messages = messages_per_guild.get(guild.id, 0)
+        objects = cached_members + len(guild.channels) + len(guild.roles) + cached_messages
+        rows.append({
+            "guild": guild,
+            "members": cached_members,
+            "member_count": guild.member_count or 0,
+            "channels": len(guild.channels),
+            "messages": cached_messages,
+            "objects": objects,
+        })
+    
+    total_objects = sum(r["objects"] for r in rows) or 1
+    for row in rows:
+        row["est_rss_bytes"] = rss * row["objects"] / total_objects
+    
+    rows.sort(key=lambda r: r["objects"], reverse=True)
+    
+    report = {
+        "rss_bytes": rss,
+        "guild_count": len(rows),
+        "cached_messages": len(bot.cached_messages),
+        "guilds": rows[:top],
+    }
+    for row in rows:
+        if row["guild"].id == guild_id:
+            report["guild"] = row
+    return report
@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from database.connection import pool_capacity
+from src import config
+
+# "Use the configured default" (None already means no limit)
+_DEFAULT = object()
+
+
+def percentile_ms(values, pct) -> float:
+    """Nearest-rank percentile of a list of seconds, in milliseconds"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+class DBExecutor:
+    """
+    Bounded thread pool for the blocking (synchronous SQLAlchemy) database
+    calls made from coroutines.
+
+    There are as many workers as the primary engine can open connections
+    (DB_POOL_SIZE + DB_MAX_OVERFLOW), so a running call never waits on the
+    connection pool: excess calls queue here instead, where queue depth and
+    wait time are measured.
+
+    Calls wait at most ``timeout`` seconds. A call that times out while still
+    queued is dropped; one that is already running can't be interrupted, so
+    it finishes in the background and keeps its worker until then.
+    """
+
+    def __init__(self, max_workers: int = None, timeout=_DEFAULT, samples: int = 1000):
+        """
+        Args:
+            max_workers: Worker threads (default: the primary pool's capacity)
+            timeout: Default seconds a caller waits for a call (default DB_CALL_TIMEOUT, None = no limit)
+            samples: Recent calls kept for the wait/run time percentiles
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.wait_times = deque(maxlen=samples)
+        self.run_times = deque(maxlen=samples)
+        self.metrics = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "abandoned": 0,
+            "max_queued": 0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Built on first call, so settings are only read once something needs the database
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.max_workers is None:
+                        self.max_workers = pool_capacity()
+                    if self.timeout is _DEFAULT:
+                        self.timeout = config.DB_CALL_TIMEOUT or None
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._executor
+
+    async def run(self, fn, *args, timeout=_DEFAULT, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` on a DB worker thread and return its result.
+
+        Args:
+            timeout: Seconds to wait (default: the executor's timeout, None = no limit)
+
+        Raises:
+            TimeoutError: The call didn't finish in time
+        """
+        executor = self._get_executor()
+        if timeout is _DEFAULT:
+            timeout = self.timeout
+        submitted = time.perf_counter()
+        state = {"started": False, "dropped": False}
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                if state["dropped"]:
+                    return None
+                state["started"] = True
+                self.queued -= 1
+                self.running += 1
+                self.wait_times.append(started - submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.run_times.append(time.perf_counter() - started)
+
+        with self._lock:
+            self.queued += 1
+            self.metrics["calls"] += 1
+            self.metrics["max_queued"] = max(self.metrics["max_queued"], self.queued)
+
+        # Same context propagation as asyncio.to_thread
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(executor, context.run, call)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics["timeouts"] += 1
+                if state["started"]:
+                    self.metrics["abandoned"] += 1
+                else:
+                    state["dropped"] = True
+                    self.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise TimeoutError(f"{getattr(fn, '__name__', fn)} took longer than {timeout}s") from None
+            raise
+        except Exception:
+            with self._lock:
+                self.metrics["errors"] += 1
+            raise
+
+    def shutdown(self):
+        """Stop accepting calls; running ones finish in the background"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict:
+        """Worker usage, queue depth and wait/run time percentiles"""
+        with self._lock:
+            wait_times = list(self.wait_times)
+            run_times = list(self.run_times)
+            queued = self.queued
+            running = self.running
+
+        return {
+            **self.metrics,
+            "workers": self.max_workers,
+            "running": running,
+            "queued": queued,
+            "timeout": self.timeout if self.timeout is not _DEFAULT else config.DB_CALL_TIMEOUT or None,
+            "wait_p50_ms": percentile_ms(wait_times, 50),
+            "wait_p95_ms": percentile_ms(wait_times, 95),
+            "wait_max_ms": max(wait_times, default=0.0) * 1000,
+            "run_p50_ms": percentile_ms(run_times, 50),
+            "run_p95_ms": percentile_ms(run_times, 95),
+        }
+
+
+# Shared by every handler and service; no threads exist until the first call
+db_executor = DBExecutor()
+
+
+async def run_db(fn, *args, timeout=_DEFAULT, **kwargs):
+    """Run a blocking database call on the shared DB executor"""
+    return await db_executor.run(fn, *args, timeout=timeout, **kwargs)
@@ -0,0 +1,215 @@
+import csv
+import gzip
+import os
+import time
+
+from database.connection import json_codec
+from database.models import Message
+from services.buffer_service import iter_messages
+
+# Parquet support is optional (pip install pyarrow)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+# Columns written to every export, in order
+EXPORT_COLUMNS = [
+    Message.message_id,
+    Message.guild_id,
+    Message.channel_id,
+    Message.author_id,
+    Message.author_name,
+    Message.content,
+    Message.created_at,
+    Message.edited_at,
+    Message.is_pinned,
+    Message.has_attachments,
+    Message.has_embeds,
+    Message.reaction_count,
+    Message.reactions_data,
+    Message.raw_data,
+]
+COLUMN_NAMES = [c.key for c in EXPORT_COLUMNS]
+
+# JSON columns are written as JSON text in CSV and Parquet
+JSON_COLUMNS = ("reactions_data", "raw_data")
+
+
+def _row_to_dict(row):
+    data = dict(zip(COLUMN_NAMES, row))
+    for key in ("created_at", "edited_at"):
+        if data[key] is not None:
+            data[key] = data[key].isoformat()
+    return data
+
+
+def _flatten_json(data):
+    for key in JSON_COLUMNS:
+        if data[key] is not None:
+            data[key] = json_codec().dumps(data[key])
+    return data
+
+
+class _TextWriter:
+    """NDJSON / CSV writer over a (optionally gzip-compressed) text file"""
+
+    def __init__(self, path, fmt, compress):
+        self.fmt = fmt
+        if compress:
+            self._file = gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=COLUMN_NAMES)
+            self._csv.writeheader()
+
+    def write_rows(self, rows):
+        if self.fmt == "ndjson":
+            self._file.writelines(json_codec().dumps(_row_to_dict(row)) + "\n" for row in rows)
+        else:
+            self._csv.writerows(_flatten_json(_row_to_dict(row)) for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Parquet writer: one row group per chunk, zstd-compressed"""
+
+    def __init__(self, path, compress):
+        self.schema = pa.schema([
+            ("message_id", pa.int64()),
+            ("guild_id", pa.int64()),
+            ("channel_id", pa.int64()),
+            ("author_id", pa.int64()),
+            ("author_name", pa.string()),
+            ("content", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("edited_at", pa.timestamp("us", tz="UTC")),
+            ("is_pinned", pa.bool_()),
+            ("has_attachments", pa.bool_()),
+            ("has_embeds", pa.bool_()),
+            ("reaction_count", pa.int64()),
+            ("reactions_data", pa.string()),
+            ("raw_data", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd" if compress else "none")
+
+    def write_rows(self, rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for name, values in zip(COLUMN_NAMES, columns):
+            if name in JSON_COLUMNS:
+                values = [json_codec().dumps(v) if v is not None else None for v in values]
+            arrays.append(pa.array(values, type=self.schema.field(name).type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def _open_writer(path, fmt, compress):
+    if fmt == "parquet":
+        return _ParquetWriter(path, compress)
+    return _TextWriter(path, fmt, compress)
+
+
+def _part_path(base_path, fmt, compress, part, chunked):
+    extension = {"ndjson": ".ndjson", "csv": ".csv", "parquet": ".parquet"}[fmt]
+    if compress and fmt != "parquet":
+        extension += ".gz"
+    suffix = f".part{part:04d}" if chunked else ""
+    return f"{base_path}{suffix}{extension}"
+
+
+def export_messages(base_path, fmt="ndjson", compress=True, chunk_size=5000, rows_per_file=None, **filters):
+    """
+    Stream messages matching get_messages-style filters to NDJSON, CSV or Parquet.
+
+    Rows are read through a server-side cursor and written chunk by chunk,
+    so memory stays constant no matter how many rows match. This is blocking -
+    run it in a thread from async code.
+
+    Args:
+        base_path: Output path without extension (extension is added per format)
+        fmt: "ndjson", "csv" or "parquet"
+        compress: gzip for NDJSON/CSV, zstd for Parquet
+        chunk_size: Rows per fetch (and per Parquet row group)
+        rows_per_file: Start a new part file after this many rows (None = single file)
+        **filters: guild_id, channel_id, author_id, from_date, to_date, has_attachments
+
+    Returns:
+        dict: files, rows, bytes, seconds and rows_per_sec
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    started = time.perf_counter()
+    chunked = rows_per_file is not None
+    files = []
+    writer = None
+    rows_in_file = 0
+    total_rows = 0
+    chunk = []
+
+    def flush_chunk():
+        nonlocal writer, rows_in_file
+        if not chunk:
+            return
+        if writer is None:
+            path = _part_path(base_path, fmt, compress, len(files) + 1, chunked)
+            writer = _open_writer(path, fmt, compress)
+            files.append(path)
+        writer.write_rows(chunk)
+        rows_in_file += len(chunk)
+        chunk.clear()
+        if chunked and rows_in_file >= rows_per_file:
+            writer.close()
+            writer = None
+            rows_in_file = 0
+
+    try:
+        for row in iter_messages(EXPORT_COLUMNS, chunk_size=chunk_size, **filters):
+            chunk.append(row)
+            total_rows += 1
+            limit = chunk_size
+            if chunked:
+                limit = min(chunk_size, rows_per_file - rows_in_file)
+            if len(chunk) >= limit:
+                flush_chunk()
+        flush_chunk()
+
+        if not files:
+            # Still produce a (header-only / empty) file so callers get something
+            path = _part_path(base_path, fmt, compress, 1, chunked)
+            writer = _open_writer(path, fmt, compress)
+            files.append(path)
+    except BaseException:
+        # Don't leave partial files behind in the export directory
+        if writer is not None:
+            writer.close()
+            writer = None
+        for path in files:
+            os.remove(path)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "files": files,
+        "rows": total_rows,
+        "bytes": sum(os.path.getsize(f) for f in files),
+        "seconds": elapsed,
+        "rows_per_sec": total_rows / elapsed if elapsed > 0 else 0.0,
+    }
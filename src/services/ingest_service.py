@@ -0,0 +1,764 @@
+import asyncio
+import os
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from database.connection import json_codec
+from services.buffer_service import apply_write_ops, check_database, message_to_data
+from services.db_executor import percentile_ms, run_db
+
+
+# Datetime fields inside message payloads (JSON has no datetime type)
+DATETIME_FIELDS = ("created_at", "edited_at")
+
+
+def encode_op(op) -> str:
+    """Serialize a write op as one JSON line"""
+    return json_codec().dumps(op)
+
+
+def decode_op(line: str):
+    """Parse a JSON line back into a write op"""
+    kind, payload = json_codec().loads(line)
+    if kind in ("save", "update"):
+        for field in DATETIME_FIELDS:
+            if payload.get(field):
+                payload[field] = datetime.fromisoformat(payload[field])
+    return [kind, payload]
+
+
+# SQLSTATEs for a server that is going away or not accepting connections
+UNAVAILABLE_SQLSTATES = ("57P01", "57P02", "57P03", "53300")
+
+# SQLite result codes for a database file that can't be used right now
+UNAVAILABLE_SQLITE_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED, sqlite3.SQLITE_IOERR, sqlite3.SQLITE_CANTOPEN)
+
+
+def is_connection_error(error) -> bool:
+    """
+    True if a DB error means the database is down/unreachable (vs. a bad row).
+
+    Only connection failures count: a schema error such as a missing table is
+    an OperationalError on SQLite too, but spilling it would just replay and
+    fail again forever.
+    """
+    if isinstance(error, PoolTimeoutError):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    if not isinstance(error, (OperationalError, InterfaceError)):
+        return False
+
+    sqlite_code = getattr(error.orig, "sqlite_errorcode", None)
+    if sqlite_code is not None:
+        # Extended result codes keep the primary code in the low byte
+        return sqlite_code & 0xFF in UNAVAILABLE_SQLITE_CODES
+
+    # psycopg reports client-side failures (connection refused or lost) without a SQLSTATE
+    sqlstate = getattr(error.orig, "sqlstate", None)
+    return sqlstate is None or sqlstate.startswith("08") or sqlstate in UNAVAILABLE_SQLSTATES
+
+
+class SpillLog:
+    """
+    Append-only, fsync-batched local log of write ops.
+
+    Ops are appended as JSON lines and fsynced every ``fsync_interval``
+    seconds by ``run_flusher``. During replay the log is rotated to
+    ``<path>.replay`` so new ops keep appending to a fresh file.
+
+    A batch that failed on the database is older than everything in the
+    log; it goes to a small ``<path>.head`` segment that is replayed first.
+
+    ``max_bytes`` is a soft limit on the live log: past it only reaction
+    snapshots are shed (see ``IngestPipeline``), every other op still spills
+    so the log keeps growing for as long as the database is away.
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 0.5, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.replay_path = path + ".replay"
+        self.head_path = path + ".head"
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self._dirty = False
+        self.appended = 0  # ops appended by this process, numbers them for replay tracking
+        # Opened on the first append, so constructing a SpillLog touches no files
+        self._file = None
+        self.bytes = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def append(self, op):
+        line = encode_op(op) + "\n"
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line)
+        self.appended += 1
+        # The codec emits UTF-8 (non-ASCII isn't escaped), so count bytes, not characters
+        self.bytes += len(line.encode("utf-8"))
+        self._dirty = True
+
+    def write_head(self, ops):
+        """
+        Save ops to be replayed before the live log (keeps order on failure).
+        Only touches the head segment, so it can run off the event loop.
+        """
+        with open(self.head_path, "a", encoding="utf-8") as out:
+            for op in ops:
+                out.write(encode_op(op) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+    def sync(self):
+        """Flush and fsync pending writes"""
+        if self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+
+    async def run_flusher(self):
+        """Background task: batch fsyncs instead of syncing every append"""
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self._dirty:
+                self._file.flush()
+                self._dirty = False
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+
+    def is_full(self) -> bool:
+        return self.bytes >= self.max_bytes
+
+    def has_pending(self) -> bool:
+        """True if there is anything (live log, head or unfinished replay) left to apply"""
+        return self.bytes > 0 or os.path.exists(self.replay_path) or os.path.exists(self.head_path)
+
+    def rotate(self) -> str:
+        """
+        Move the current log aside for replay and start a fresh one.
+
+        An unfinished replay file (crash or DB failure mid-replay) is older
+        than the live log, so it is returned first and the live log is left
+        alone. The head segment comes next, then the live log.
+        """
+        if os.path.exists(self.replay_path):
+            return self.replay_path
+
+        if os.path.exists(self.head_path):
+            os.replace(self.head_path, self.replay_path)
+            return self.replay_path
+
+        self.close()
+        os.replace(self.path, self.replay_path)
+        self.bytes = 0
+        return self.replay_path
+
+    def read(self, path: str):
+        """Yield ops from a log file, skipping a truncated trailing line"""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield decode_op(line)
+                except ValueError:
+                    continue
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class GuildQueue:
+    """Pending write ops and fair-scheduling state for one guild"""
+
+    def __init__(self, guild_id, weight: float = 1.0, rate_cap: float = 0.0):
+        self.guild_id = guild_id
+        self.weight = weight
+        self.rate_cap = rate_cap  # ops/sec, 0 = unlimited
+        self.items = deque()
+        self.deficit = 0.0
+        # The bucket holds at least one op, or a cap below 1 op/s would never send
+        self.burst = max(1.0, rate_cap) if rate_cap else 0.0
+        self.tokens = self.burst
+        self.refilled_at = time.monotonic()
+        self.spilling = False
+        self.spill_seq = 0  # position of its last op in the spill log
+
+        self.written = 0
+        self.spilled = 0
+        self.shed = 0
+        self.lag = deque(maxlen=200)
+
+    def refill(self, now):
+        if self.rate_cap:
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate_cap)
+            self.refilled_at = now
+
+    def allowance(self) -> int:
+        """How many ops the rate cap allows right now"""
+        if not self.rate_cap:
+            return len(self.items)
+        return int(self.tokens)
+
+
+class FairScheduler:
+    """
+    Deficit round robin over per-guild queues.
+
+    Every round each active guild earns ``quantum * weight`` ops of credit and
+    may send that many (capped by its token-bucket rate cap), so a guild with
+    thousands of queued writes only delays itself: quiet guilds still get
+    their writes into the very next batch.
+    """
+
+    def __init__(self, quantum: int = 10, weights=None, default_rate_cap: float = 0.0, rate_caps=None):
+        self.quantum = quantum
+        self.weights = weights or {}
+        self.default_rate_cap = default_rate_cap
+        self.rate_caps = rate_caps or {}
+        self.guilds = {}
+        self.active = deque()
+        self.total = 0
+
+    def get(self, guild_id) -> GuildQueue:
+        guild_queue = self.guilds.get(guild_id)
+        if guild_queue is None:
+            guild_queue = GuildQueue(
+                guild_id,
+                weight=self.weights.get(guild_id, 1.0),
+                rate_cap=self.rate_caps.get(guild_id, self.default_rate_cap)
+            )
+            self.guilds[guild_id] = guild_queue
+        return guild_queue
+
+    def push(self, guild_queue: GuildQueue, item):
+        if not guild_queue.items:
+            self.active.append(guild_queue.guild_id)
+        guild_queue.items.append(item)
+        self.total += 1
+
+    def drain(self, guild_queue: GuildQueue):
+        """Remove and return every pending item of a guild, oldest first"""
+        items = list(guild_queue.items)
+        guild_queue.items.clear()
+        guild_queue.deficit = 0.0
+        self.total -= len(items)
+        return items
+
+    def next_batch(self, batch_size: int):
+        """
+        Take up to ``batch_size`` items in one DRR round.
+
+        Returns:
+            list: (guild_queue, item) pairs
+        """
+        now = time.monotonic()
+        batch = []
+
+        for _ in range(len(self.active)):
+            if len(batch) >= batch_size:
+                break
+
+            guild_id = self.active.popleft()
+            guild_queue = self.guilds[guild_id]
+            if not guild_queue.items:
+                # Drained by spill mode since it was scheduled
+                guild_queue.deficit = 0.0
+                continue
+
+            guild_queue.refill(now)
+            credit = self.quantum * guild_queue.weight
+            # Credit below one op per round carries over until it adds up to one
+            guild_queue.deficit = min(guild_queue.deficit + credit, max(2 * credit, 1.0))
+
+            take = min(
+                int(guild_queue.deficit),
+                len(guild_queue.items),
+                batch_size - len(batch),
+                guild_queue.allowance()
+            )
+            for _ in range(take):
+                batch.append((guild_queue, guild_queue.items.popleft()))
+
+            guild_queue.deficit -= take
+            if guild_queue.rate_cap:
+                guild_queue.tokens -= take
+            self.total -= take
+
+            if guild_queue.items:
+                self.active.append(guild_id)
+            else:
+                guild_queue.deficit = 0.0
+
+        return batch
+
+    def next_ready_in(self):
+        """Seconds until a waiting guild can send again (None if nothing is waiting)"""
+        now = time.monotonic()
+        waits = []
+        for guild_id in self.active:
+            guild_queue = self.guilds[guild_id]
+            if not guild_queue.items:
+                continue
+            guild_queue.refill(now)
+            if guild_queue.rate_cap and guild_queue.tokens < 1:
+                waits.append((1 - guild_queue.tokens) / guild_queue.rate_cap)
+            else:
+                # Only short of DRR credit, which the next round adds
+                waits.append(0.0)
+        return max(0.01, min(waits)) if waits else None
+
+
+class IngestPipeline:
+    """
+    Bounded, non-blocking write path between the gateway handlers and Postgres.
+
+    Handlers submit write ops tagged with their guild. Each guild has its own
+    bounded queue, and a single worker builds batches from those queues with
+    weighted fair queuing (see ``FairScheduler``), applying them in one
+    transaction off the event loop.
+
+    Spill mode keeps ops durable without blocking the gateway:
+        - a guild whose queue overflows (DB slow, or the guild is flooding)
+          spills only its own writes to the local log
+        - when the shared queue is full, the guild with the most queued ops
+          spills, not whichever guild happened to submit next
+        - a DB failure spills every guild
+    The log is replayed in order (recent duplicate saves are skipped by message_id),
+    interleaved with live batches. A spilling guild goes back to live writes
+    as soon as its own spilled ops have been replayed; after a DB failure
+    every guild waits for the whole log to drain.
+
+    Overflow policies:
+        spill - spill every op (nothing is ever dropped)
+        shed  - drop a guild's reaction updates while its queue is over the
+                high watermark or it is spilling (the next reaction event
+                rewrites the full list anyway), spill everything else
+    """
+
+    def __init__(
+        self,
+        spill_log: SpillLog,
+        scheduler: FairScheduler = None,
+        queue_size: int = 10000,
+        guild_queue_size: int = 2000,
+        batch_size: int = 100,
+        overflow_policy: str = "spill",
+        retry_interval: float = 5.0,
+        high_watermark: float = 0.8,
+        dedup_window: int = 10000,
+    ):
+        if overflow_policy not in ("spill", "shed"):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.spill_log = spill_log
+        self.scheduler = scheduler or FairScheduler()
+        self.queue_size = queue_size
+        self.guild_queue_size = guild_queue_size
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.retry_interval = retry_interval
+        self.high_watermark = int(guild_queue_size * high_watermark)
+        self._warned_spill_full = False
+        self.dedup_window = dedup_window
+
+        # Leftovers from a previous run are replayed before any live write
+        self.spilling_all = spill_log.has_pending()
+        self.db_down = False
+        self._wakeup = None
+        self._in_flight = []
+        self._replay_iter = None
+        self._replay_path = None
+        self._replay_seen = {}
+        self._replayed_seq = 0
+        self._replay_start_seq = 0
+        self._tasks = []
+
+        self.metrics = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "deduplicated": 0,
+            "shed": 0,
+            "failed": 0,
+            "spill_episodes": 0,
+        }
+        self.write_lag = deque(maxlen=1000)
+        self.batch_latency = deque(maxlen=1000)
+
+    # ===== Lifecycle =====
+
+    def start(self):
+        """Start the worker and fsync tasks (call from a running event loop)"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run_worker(), name="ingest-worker"),
+            asyncio.create_task(self.spill_log.run_flusher(), name="ingest-spill-flusher"),
+        ]
+        if self.spilling_all:
+            print("⚠️ Spill log has pending ops from a previous run, replaying before live writes")
+
+    @property
+    def spilling(self) -> bool:
+        return self.spilling_all or any(g.spilling for g in self.scheduler.guilds.values())
+
+    async def join(self):
+        """Wait until every submitted op has reached the database"""
+        while self.scheduler.total or self._in_flight or self.spilling or self.spill_log.has_pending():
+            await asyncio.sleep(0.05)
+
+    def close(self):
+        """Persist anything not yet written to the spill log (replayed on next start)"""
+        for task in self._tasks:
+            task.cancel()
+
+        self._spill_in_flight()
+        for guild_queue in self.scheduler.guilds.values():
+            for op, _ in self.scheduler.drain(guild_queue):
+                self._spill(op, guild_queue)
+
+        self.spill_log.close()
+
+    # ===== Submitting =====
+
+    def submit(self, op, guild_id):
+        """
+        Hand a write op to the pipeline. Never blocks.
+
+        Args:
+            op: [kind, payload] as accepted by ``buffer_service.apply_write_ops``
+            guild_id: Guild the op belongs to (used for fair scheduling)
+        """
+        self.metrics["submitted"] += 1
+        guild_queue = self.scheduler.get(guild_id)
+
+        if op[0] == "reactions" and self._should_shed(guild_queue):
+            guild_queue.shed += 1
+            self.metrics["shed"] += 1
+            return
+
+        if self._wakeup is None or self.spilling_all or guild_queue.spilling:
+            # Not started yet (tooling) or spilling - keep order by going to the log
+            self._spill(op, guild_queue)
+            return
+
+        if len(guild_queue.items) >= self.guild_queue_size:
+            print(f"⚠️ Ingest queue full for guild {guild_id} ({len(guild_queue.items)} pending), spilling its writes")
+            self._spill_guild(guild_queue)
+            self._spill(op, guild_queue)
+            return
+
+        if self.scheduler.total >= self.queue_size:
+            # Make room by spilling the guild causing the backlog
+            busiest = max(self.scheduler.guilds.values(), key=lambda g: len(g.items))
+            print(
+                f"⚠️ Ingest queue full ({self.scheduler.total} pending), spilling writes for "
+                f"guild {busiest.guild_id} ({len(busiest.items)} pending)"
+            )
+            self._spill_guild(busiest)
+            if busiest is guild_queue:
+                self._spill(op, guild_queue)
+                return
+
+        self.scheduler.push(guild_queue, (op, time.perf_counter()))
+        self._wakeup.set()
+
+    def _should_shed(self, guild_queue: GuildQueue) -> bool:
+        spilling = self.spilling_all or guild_queue.spilling
+        if self.overflow_policy == "shed" and (spilling or len(guild_queue.items) >= self.high_watermark):
+            return True
+        # Past the spill log's soft limit, stop adding reaction updates to it -
+        # they are superseded by the next reaction event anyway
+        return spilling and self.spill_log.is_full()
+
+    def submit_save(self, discord_message):
+        self.submit(["save", message_to_data(discord_message)], discord_message.guild.id)
+
+    def submit_update(self, discord_message):
+        self.submit(["update", message_to_data(discord_message)], discord_message.guild.id)
+
+    def submit_delete(self, message_id, guild_id):
+        self.submit(["delete", message_id], guild_id)
+
+    def submit_bulk_delete(self, message_ids, guild_id):
+        self.submit(["bulk_delete", list(message_ids)], guild_id)
+
+    def submit_reactions(self, message_id, guild_id, reactions_data, reaction_count):
+        self.submit(["reactions", {
+            "message_id": message_id,
+            "reactions_data": reactions_data,
+            "reaction_count": reaction_count,
+        }], guild_id)
+
+    def submit_reaction_delta(self, message_id, guild_id, emoji, is_custom, delta):
+        # Never shed: unlike "reactions", a delta isn't superseded by the next event
+        self.submit(["reaction_delta", {
+            "message_id": message_id,
+            "emoji": emoji,
+            "is_custom": is_custom,
+            "delta": delta,
+        }], guild_id)
+
+    # ===== Spill mode =====
+
+    def _spill(self, op, guild_queue: GuildQueue):
+        self.spill_log.append(op)
+        guild_queue.spill_seq = self.spill_log.appended
+        guild_queue.spilled += 1
+        self.metrics["spilled"] += 1
+        if self.spill_log.is_full() and not self._warned_spill_full:
+            self._warned_spill_full = True
+            print(
+                f"🚨 Spill log {self.spill_log.path} is over its soft limit of "
+                f"{self.spill_log.max_bytes // (1024 * 1024)} MB: shedding reaction updates, "
+                f"other writes keep spilling and disk usage keeps growing"
+            )
+        if self._wakeup:
+            # Let an idle worker start replaying
+            self._wakeup.set()
+
+    def _spill_in_flight(self):
+        # In-flight ops are older than anything queued (re-applying is harmless)
+        for op in self._in_flight:
+            self.spill_log.append(op)
+        self.metrics["spilled"] += len(self._in_flight)
+        self._in_flight = []
+
+    def _spill_guild(self, guild_queue: GuildQueue):
+        """Send one guild's writes to the log, moving its queue (older ops) there first"""
+        if not guild_queue.spilling:
+            guild_queue.spilling = True
+            self.metrics["spill_episodes"] += 1
+
+        for op, _ in self.scheduler.drain(guild_queue):
+            self._spill(op, guild_queue)
+
+    def _spill_all(self):
+        if not self.spilling_all:
+            self.spilling_all = True
+            self.metrics["spill_episodes"] += 1
+
+        for guild_queue in self.scheduler.guilds.values():
+            for op, _ in self.scheduler.drain(guild_queue):
+                self._spill(op, guild_queue)
+
+    def _resume_replayed_guilds(self):
+        """Put spilling guilds whose spilled ops have all been replayed back on live writes"""
+        if self.spilling_all:
+            return
+        for guild_queue in self.scheduler.guilds.values():
+            if guild_queue.spilling and guild_queue.spill_seq <= self._replayed_seq:
+                guild_queue.spilling = False
+                print(f"✅ Spilled writes for guild {guild_queue.guild_id} replayed, resuming live writes")
+
+    def _resume_live(self):
+        self.spilling_all = False
+        # The log is empty, so everything appended so far counts as replayed
+        self._replayed_seq = self.spill_log.appended
+        self._warned_spill_full = False
+        for guild_queue in self.scheduler.guilds.values():
+            guild_queue.spilling = False
+        print(f"✅ Spill log replayed, resuming live writes ({self.metrics['replayed']} ops replayed)")
+
+    async def _wait_for_db(self):
+        try:
+            reachable = await run_db(check_database)
+        except TimeoutError:
+            reachable = False
+
+        if reachable:
+            self.db_down = False
+            print("✅ Database reachable again")
+        else:
+            await asyncio.sleep(self.retry_interval)
+
+    async def _replay_step(self):
+        """Replay one batch from the spill log, interleaved with live batches"""
+        if self._replay_iter is None:
+            self._replay_path = self.spill_log.rotate()
+            self._replay_iter = self.spill_log.read(self._replay_path)
+            self._replay_seen = {}
+            self._replay_start_seq = self._replayed_seq
+            print(f"🔁 Replaying spill log {self._replay_path}...")
+
+        ops = []
+        consumed = 0
+        for op in self._replay_iter:
+            consumed += 1
+            if op[0] == "save":
+                message_id = op[1]["message_id"]
+                if message_id in self._replay_seen:
+                    self.metrics["deduplicated"] += 1
+                    continue
+                # Only the last dedup_window saves are remembered, so a replay file of
+                # any size uses bounded memory (save_many skips stored messages anyway)
+                self._replay_seen[message_id] = None
+                if len(self._replay_seen) > self.dedup_window:
+                    del self._replay_seen[next(iter(self._replay_seen))]
+
+            ops.append(op)
+            if len(ops) >= self.batch_size:
+                break
+
+        if ops:
+            try:
+                await self._apply_batch(ops)
+            except Exception as e:
+                # The replay file stays on disk and is replayed from the start later
+                print(f"❌ Database failed during spill replay: {e}")
+                self._replay_iter.close()
+                self._replay_iter = None
+                self._replayed_seq = self._replay_start_seq
+                self.db_down = True
+                return
+            self.metrics["replayed"] += len(ops)
+
+        # Outside a DB failure, the replay file holds the live log's ops in
+        # append order, so this tracks how far into the log replay has got
+        self._replayed_seq += consumed
+        self._resume_replayed_guilds()
+        if len(ops) >= self.batch_size:
+            return
+
+        # Replay file exhausted
+        self._replay_iter = None
+        os.remove(self._replay_path)
+
+        # No awaits between this check and the flag flip, so nothing can
+        # be spilled in between
+        if not self.spill_log.has_pending():
+            self._resume_live()
+
+    # ===== Worker =====
+
+    async def _apply(self, ops):
+        started = time.perf_counter()
+        # No timeout: an abandoned write could still commit after being retried or spilled
+        await run_db(apply_write_ops, ops, timeout=None)
+        self.batch_latency.append(time.perf_counter() - started)
+        self.metrics["batches"] += 1
+        self.metrics["written"] += len(ops)
+
+    async def _apply_batch(self, ops):
+        """
+        Apply ops in one transaction. If a bad row fails the batch, retry op by
+        op and drop only the failing ones. Connection errors are raised.
+        """
+        try:
+            await self._apply(ops)
+        except Exception as e:
+            if is_connection_error(e):
+                raise
+            for op in ops:
+                try:
+                    await self._apply([op])
+                except Exception as e:
+                    if is_connection_error(e):
+                        raise
+                    self.metrics["failed"] += 1
+                    print(f"❌ Dropping write op {op[0]}: {e}")
+
+    async def _write_live(self, batch):
+        self._in_flight = [op for _, (op, _) in batch]
+
+        try:
+            await self._apply_batch(self._in_flight)
+        except asyncio.CancelledError:
+            # Shutdown while the batch waits on the DB executor: it may or may
+            # not commit, so keep it for replay
+            self._spill_in_flight()
+            raise
+        except Exception as e:
+            print(f"❌ Database unavailable, spilling to {self.spill_log.path}: {e}")
+            self.db_down = True
+            self._spill_all()
+            # This batch is older than anything already in the log. The log can be
+            # hundreds of MB, so rather than rewriting it the batch goes to the
+            # head segment, written off the loop
+            await asyncio.to_thread(self.spill_log.write_head, self._in_flight)
+            self.metrics["spilled"] += len(self._in_flight)
+            self._in_flight = []
+            return
+        self._in_flight = []
+
+        finished = time.perf_counter()
+        for guild_queue, (_, submitted_at) in batch:
+            lag = finished - submitted_at
+            guild_queue.lag.append(lag)
+            guild_queue.written += 1
+            self.write_lag.append(lag)
+
+    async def _run_worker(self):
+        while True:
+            if self.db_down:
+                await self._wait_for_db()
+                continue
+
+            worked = False
+            if self._replay_iter is not None or self.spill_log.has_pending():
+                await self._replay_step()
+                worked = True
+
+            batch = self.scheduler.next_batch(self.batch_size)
+            if batch:
+                await self._write_live(batch)
+                worked = True
+
+            if not worked:
+                # Idle, or every waiting guild is held back by its rate cap
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.scheduler.next_ready_in())
+                except asyncio.TimeoutError:
+                    pass
+
+    # ===== Metrics =====
+
+    def guild_snapshot(self, guild_queue: GuildQueue) -> dict:
+        return {
+            "guild_id": guild_queue.guild_id,
+            "weight": guild_queue.weight,
+            "rate_cap": guild_queue.rate_cap,
+            "queue_depth": len(guild_queue.items),
+            "spilling": guild_queue.spilling or self.spilling_all,
+            "written": guild_queue.written,
+            "spilled": guild_queue.spilled,
+            "shed": guild_queue.shed,
+            "lag_p50_ms": percentile_ms(guild_queue.lag, 50),
+            "lag_p95_ms": percentile_ms(guild_queue.lag, 95),
+        }
+
+    def snapshot(self, guild_id=None, top: int = 3) -> dict:
+        """Current metrics, queue/spill state and the most backed-up guilds"""
+        guild_queues = list(self.scheduler.guilds.values())
+        busiest = sorted(
+            guild_queues,
+            key=lambda g: (len(g.items), percentile_ms(g.lag, 95)),
+            reverse=True
+        )[:top]
+
+        snapshot = {
+            **self.metrics,
+            "queue_depth": self.scheduler.total,
+            "queue_size": self.queue_size,
+            "spilling": self.spilling,
+            "spilling_guilds": sum(1 for g in guild_queues if g.spilling),
+            "spill_bytes": self.spill_log.bytes,
+            "spill_soft_limit_bytes": self.spill_log.max_bytes,
+            "lag_p50_ms": percentile_ms(self.write_lag, 50),
+            "lag_p95_ms": percentile_ms(self.write_lag, 95),
+            "busiest": [self.guild_snapshot(g) for g in busiest],
+        }
+        if guild_id is not None and guild_id in self.scheduler.guilds:
+            snapshot["guild"] = self.guild_snapshot(self.scheduler.guilds[guild_id])
+        return snapshot
@@ -1,14 +1,27 @@
 
 
 import asyncio
+import heapq
+import math
+import random
+import time
+from datetime import timedelta
 import discord
 from services.buffer_service import (
     save_message, 
     delete_message, 
-    get_channel_message_ids,
+    get_channel_message_ids_between,
+    get_channel_message_ids_since,
     message_exists,
     bulk_delete_messages
 )
+from services.db_executor import run_db
+
+# Extra window before a disconnect to cover events in flight when the socket dropped
+GAP_SLACK = timedelta(seconds=30)
+
+# Max messages fetched per channel for a gap; beyond this we don't trust deletes
+GAP_FETCH_LIMIT = 1000
 
 
 async def reconcile_channel(channel: discord.TextChannel, chunk_size: int = 100):
@@ -16,9 +29,6 @@ async def reconcile_channel(channel: discord.TextChannel, chunk_size: int = 100)
     try:
         print(f"  📥 Reconciling #{channel.name}...")
         
-        # Get message IDs currently in our database for this channel
-        db_message_ids = get_channel_message_ids(channel.id, limit=chunk_size)
-        
         # Fetch recent messages from Discord API
         discord_messages = []
         discord_message_ids = set()
@@ -27,6 +37,17 @@ async def reconcile_channel(channel: discord.TextChannel, chunk_size: int = 100)
             discord_messages.append(message)
             discord_message_ids.add(message.id)
         
+        if not discord_messages:
+            print(f"    ✅ #{channel.name}: up to date")
+            return 0, 0
+        
+        # Only compare the ID range Discord returned. The newest N rows in the DB
+        # reach further back when recent messages are still queued for ingest,
+        # and rows outside the fetched range are unknown, not deleted.
+        db_message_ids = await run_db(
+            get_channel_message_ids_between, channel.id, min(discord_message_ids), max(discord_message_ids)
+        )
+        
         # Find messages to ADD (in Discord but not in DB)
         messages_to_add = [
             msg for msg in discord_messages 
@@ -40,13 +61,13 @@ async def reconcile_channel(channel: discord.TextChannel, chunk_size: int = 100)
         added_count = 0
         for msg in messages_to_add:
             if not msg.author.bot:  # Skip bot messages
-                save_message(msg)
+                await run_db(save_message, msg, timeout=None)
                 added_count += 1
         
         # Delete removed messages (hard delete)
         deleted_count = 0
         if messages_to_delete:
-            deleted_count = bulk_delete_messages(list(messages_to_delete))
+            deleted_count = await run_db(bulk_delete_messages, list(messages_to_delete), timeout=None)
         
         if added_count > 0 or deleted_count > 0:
             print(f"    ✅ #{channel.name}: +{added_count} added, -{deleted_count} deleted")
@@ -98,24 +119,28 @@ async def reconcile_guild(guild: discord.Guild):
     return total_added, total_deleted
 
 
-async def run_startup_reconciliation(bot):
+async def run_startup_reconciliation(bot, shard_id=None):
     """
     Run reconciliation for all guilds on bot startup.
     
-    This is called from on_ready() as a background task.
+    This is called from on_shard_ready() as a background task.
     It doesn't block command handling.
     
     Args:
         bot: The Discord bot instance
+        shard_id: Only reconcile guilds on this shard (None = all guilds in this process)
     """
+    shard_label = f" (shard {shard_id})" if shard_id is not None else ""
     print("\n" + "=" * 50)
-    print("🔍 STARTING RECONCILIATION")
+    print(f"🔍 STARTING RECONCILIATION{shard_label}")
     print("=" * 50)
     
     total_added = 0
     total_deleted = 0
     
-    for guild in bot.guilds:
+    guilds = [g for g in bot.guilds if shard_id is None or g.shard_id == shard_id]
+    
+    for guild in guilds:
         try:
             added, deleted = await reconcile_guild(guild)
             total_added += added
@@ -124,6 +149,316 @@ async def run_startup_reconciliation(bot):
             print(f"❌ Error reconciling guild {guild.name}: {e}")
     
     print("=" * 50)
-    print(f" RECONCILIATION COMPLETE")
+    print(f" RECONCILIATION COMPLETE{shard_label}")
     print(f"   Total: +{total_added} messages added, -{total_deleted} messages deleted")
     print("=" * 50 + "\n")
+
+
+async def reconcile_channel_since(channel: discord.TextChannel, since):
+    """
+    Reconcile only the messages created after `since` in a channel.
+    
+    Args:
+        channel: The Discord channel to reconcile
+        since: Start of the window (aware datetime)
+    
+    Returns:
+        tuple: (added_count, deleted_count)
+    """
+    try:
+        db_message_ids = await run_db(get_channel_message_ids_since, channel.id, since)
+        
+        discord_messages = []
+        async for message in channel.history(limit=GAP_FETCH_LIMIT, after=since, oldest_first=True):
+            discord_messages.append(message)
+        discord_message_ids = {m.id for m in discord_messages}
+        
+        added_count = 0
+        for msg in discord_messages:
+            if msg.id not in db_message_ids and not msg.author.bot:
+                await run_db(save_message, msg, timeout=None)
+                added_count += 1
+        
+        # If the window was truncated we can't tell deleted from not-yet-fetched
+        deleted_count = 0
+        if len(discord_messages) < GAP_FETCH_LIMIT:
+            messages_to_delete = db_message_ids - discord_message_ids
+            if messages_to_delete:
+                deleted_count = await run_db(bulk_delete_messages, list(messages_to_delete), timeout=None)
+        
+        print(f"    ✅ #{channel.name} (gap): +{added_count} added, -{deleted_count} deleted")
+        return added_count, deleted_count
+        
+    except discord.Forbidden:
+        print(f"    ⚠️ No permission to read #{channel.name}")
+        return 0, 0
+    except Exception as e:
+        print(f"    ❌ Error reconciling gap in #{channel.name}: {e}")
+        return 0, 0
+
+
+async def run_gap_reconciliation(bot, since, shard_id=None):
+    """
+    Cheap reconciliation after a gateway reconnect.
+    
+    Only channels whose last message is newer than the disconnect are
+    revisited, and only for the disconnect window.
+    
+    Args:
+        bot: The Discord bot instance
+        since: When the shard disconnected (aware datetime)
+        shard_id: Only reconcile guilds on this shard (None = all guilds in this process)
+    """
+    window_start = since - GAP_SLACK
+    print(f"\n🔍 Gap reconciliation since {window_start:%H:%M:%S} (shard {shard_id})")
+    
+    total_added = 0
+    total_deleted = 0
+    channels_processed = 0
+    
+    for guild in bot.guilds:
+        if shard_id is not None and guild.shard_id != shard_id:
+            continue
+        
+        for channel in guild.text_channels:
+            # last_message_id is refreshed from GUILD_CREATE on re-identify
+            if not channel.last_message_id:
+                continue
+            if discord.utils.snowflake_time(channel.last_message_id) < window_start:
+                continue
+            
+            permissions = channel.permissions_for(guild.me)
+            if not (permissions.read_message_history and permissions.view_channel):
+                continue
+            
+            added, deleted = await reconcile_channel_since(channel, window_start)
+            total_added += added
+            total_deleted += deleted
+            channels_processed += 1
+            
+            await asyncio.sleep(0.5)
+    
+    print(f"✅ Gap reconciliation complete: {channels_processed} channels, +{total_added} added, -{total_deleted} deleted\n")
+    
+    return total_added, total_deleted
+
+
+class PeriodicReconciler:
+    """
+    Long-running reconciler that keeps revisiting channels after startup, so
+    drift from missed gateway events doesn't pile up until the next restart.
+
+    Each channel is revisited after roughly one reconcile window of new
+    messages at its recent rate (an exponentially decaying average of live
+    messages), clamped between ``min_interval`` and ``max_interval``: busy
+    channels come up every few minutes, dormant ones about once a day.
+
+    Visits share a global API budget (history requests per minute) and wait
+    while live ingest is spilling or backed up with high write lag.
+    """
+
+    def __init__(
+        self,
+        bot,
+        ingest,
+        min_interval: float = 300,
+        max_interval: float = 86400,
+        window: int = 100,
+        api_budget: float = 30,
+        max_ingest_lag_ms: float = 2000,
+        activity_half_life: float = 3600,
+        refresh_interval: float = 600,
+        pause_interval: float = 5.0,
+    ):
+        """
+        Args:
+            bot: The Discord bot instance
+            ingest: The live IngestPipeline (its lag pauses reconciliation)
+            min_interval: Shortest time between visits of a channel (seconds)
+            max_interval: Longest time between visits of a channel (seconds)
+            window: Messages compared per visit (see ``reconcile_channel``)
+            api_budget: History requests per minute across all channels
+            max_ingest_lag_ms: Pause while backed-up ingest has a p95 write lag above this
+            activity_half_life: Half-life of the per-channel message rate (seconds)
+            refresh_interval: How often new channels are picked up and schedules re-checked
+            pause_interval: Seconds between ingest checks while paused
+        """
+        self.bot = bot
+        self.ingest = ingest
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.api_budget = api_budget
+        self.max_ingest_lag_ms = max_ingest_lag_ms
+        self.decay = math.log(2) / activity_half_life
+        self.refresh_interval = refresh_interval
+        self.pause_interval = pause_interval
+
+        # channel_id -> (messages/sec, monotonic time of last update)
+        self.activity = {}
+        # (due, channel_id) heap; `scheduled` holds the live due time per channel,
+        # entries that don't match it are stale and skipped
+        self.queue = []
+        self.scheduled = {}
+        self.tokens = api_budget
+        self.tokens_at = time.monotonic()
+        self._task = None
+
+        self.metrics = {
+            "visits": 0,
+            "added": 0,
+            "deleted": 0,
+            "paused_seconds": 0.0,
+            "budget_wait_seconds": 0.0,
+        }
+
+    # ===== Activity =====
+
+    def record_activity(self, channel_id):
+        """Count one live message in a channel (call from on_message)"""
+        now = time.monotonic()
+        self.activity[channel_id] = (self.rate(channel_id, now) + self.decay, now)
+
+    def rate(self, channel_id, now=None) -> float:
+        """Recent messages/sec in a channel (decays while the channel is quiet)"""
+        if channel_id not in self.activity:
+            return 0.0
+        rate, updated = self.activity[channel_id]
+        now = time.monotonic() if now is None else now
+        return rate * math.exp(-self.decay * (now - updated))
+
+    def interval(self, channel_id, now=None) -> float:
+        """Seconds until a channel should be revisited, from its recent activity"""
+        rate = self.rate(channel_id, now)
+        if rate <= 0:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, self.window / rate))
+
+    # ===== Scheduling =====
+
+    def _schedule(self, channel_id, due):
+        self.scheduled[channel_id] = due
+        heapq.heappush(self.queue, (due, channel_id))
+
+    def _refresh(self, now):
+        """Pick up new channels and pull forward channels that became busy"""
+        for guild in self.bot.guilds:
+            if guild.unavailable:
+                continue
+            for channel in guild.text_channels:
+                due = now + self.interval(channel.id, now)
+                scheduled = self.scheduled.get(channel.id)
+                if scheduled is None:
+                    # Startup reconciliation just ran - spread first visits over one interval
+                    self._schedule(channel.id, now + (due - now) * random.uniform(0.5, 1.0))
+                elif due < scheduled:
+                    self._schedule(channel.id, due)
+
+    async def _wait_for_budget(self, cost):
+        """Token bucket: api_budget history requests per minute"""
+        refill = self.api_budget / 60
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.api_budget, self.tokens + (now - self.tokens_at) * refill)
+            self.tokens_at = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return
+            wait = (cost - self.tokens) / refill
+            self.metrics["budget_wait_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    def ingest_lagging(self) -> bool:
+        """True while live ingest needs the database more than we do"""
+        m = self.ingest.snapshot(top=0)
+        # Lag percentiles linger after a spike - only trust them while a backlog exists
+        return m["spilling"] or (m["queue_depth"] > 0 and m["lag_p95_ms"] > self.max_ingest_lag_ms)
+
+    async def _wait_for_ingest(self):
+        started = None
+        while self.ingest_lagging():
+            if started is None:
+                started = time.monotonic()
+                print("⏸️ Periodic reconciliation paused, live ingest is lagging")
+            await asyncio.sleep(self.pause_interval)
+        if started is not None:
+            self.metrics["paused_seconds"] += time.monotonic() - started
+
+    # ===== Loop =====
+
+    def start(self):
+        """Start the reconciler in the background (no-op if already running)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self.run(), name="periodic-reconciler")
+
+    async def run(self):
+        next_refresh = 0.0
+        # One history page per 100 messages compared
+        cost = math.ceil(self.window / 100)
+
+        while True:
+            now = time.monotonic()
+            if now >= next_refresh:
+                self._refresh(now)
+                next_refresh = now + self.refresh_interval
+
+            if not self.queue:
+                await asyncio.sleep(self.refresh_interval)
+                continue
+
+            due, channel_id = self.queue[0]
+            if self.scheduled.get(channel_id) != due:
+                heapq.heappop(self.queue)
+                continue
+            if due > now:
+                await asyncio.sleep(min(due, next_refresh) - now)
+                continue
+            heapq.heappop(self.queue)
+
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                # Deleted, or its guild left - forget it
+                self.scheduled.pop(channel_id, None)
+                self.activity.pop(channel_id, None)
+                continue
+
+            permissions = channel.permissions_for(channel.guild.me)
+            if permissions.read_message_history and permissions.view_channel:
+                await self._wait_for_ingest()
+                await self._wait_for_budget(cost)
+                added, deleted = await reconcile_channel(channel, chunk_size=self.window)
+                self.metrics["visits"] += 1
+                self.metrics["added"] += added
+                self.metrics["deleted"] += deleted
+
+            self._schedule(channel_id, time.monotonic() + self.interval(channel_id))
+
+    # ===== Metrics =====
+
+    def snapshot(self, top: int = 5, channel_ids=None) -> dict:
+        """
+        Reconciler metrics, the busiest channels and what is due next.
+
+        Args:
+            top: Channels listed in "busiest" and "upcoming"
+            channel_ids: Only list these channels (e.g. one guild's), default all
+        """
+        now = time.monotonic()
+        activity = [cid for cid in self.activity if channel_ids is None or cid in channel_ids]
+        scheduled = [(due, cid) for cid, due in self.scheduled.items() if channel_ids is None or cid in channel_ids]
+        busiest = sorted(activity, key=lambda cid: self.rate(cid, now), reverse=True)[:top]
+        upcoming = sorted(scheduled)[:top]
+        return {
+            **self.metrics,
+            "running": bool(self._task and not self._task.done()),
+            "channels": len(self.scheduled),
+            "due_now": sum(1 for due in self.scheduled.values() if due <= now),
+            "tokens": self.tokens,
+            "paused": self.ingest_lagging(),
+            "busiest": [
+                {"channel_id": cid, "rate_per_min": self.rate(cid, now) * 60, "interval_s": self.interval(cid, now)}
+                for cid in busiest
+            ],
+            "upcoming": [{"channel_id": cid, "in_s": max(0.0, due - now)} for due, cid in upcoming],
+        }
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import math
+import time
+
+
+# Gateway dispatch events our handlers in main.py care about.
+# GUILD_CREATE is kept so replay can rebuild the guild/channel cache offline.
+RECORDED_EVENTS = {
+    "GUILD_CREATE",
+    "MESSAGE_CREATE",
+    "MESSAGE_UPDATE",
+    "MESSAGE_DELETE",
+    "MESSAGE_DELETE_BULK",
+    "MESSAGE_REACTION_ADD",
+    "MESSAGE_REACTION_REMOVE",
+}
+
+# Heavy GUILD_CREATE keys we never need for replay (keeps the file compact)
+STRIPPED_GUILD_KEYS = ("members", "presences", "voice_states", "stage_instances", "guild_scheduled_events")
+
+# Gateway events whose handlers are timed for handler lag
+HANDLER_EVENTS = {
+    "MESSAGE_CREATE": "message",
+    "MESSAGE_UPDATE": "message_edit",
+    "MESSAGE_DELETE": "message_delete",
+    "MESSAGE_DELETE_BULK": "bulk_message_delete",
+    "MESSAGE_REACTION_ADD": "reaction_add",
+    "MESSAGE_REACTION_REMOVE": "reaction_remove",
+}
+
+
+class EventRecorder:
+    """
+    Append-only recorder for the gateway dispatch stream.
+
+    Each dispatch is written as one compact JSON line:
+        [unix_time, "EVENT_NAME", data]
+
+    Wire it to ``on_socket_raw_receive`` (requires ``enable_debug_events=True``).
+    """
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self.recorded = 0
+        # Opened on the first recorded dispatch, not at construction
+        self._file = None
+
+    def record(self, payload: dict):
+        """
+        Record a raw gateway payload if it is a dispatch we handle.
+
+        Args:
+            payload: The decoded gateway message (``op``, ``t``, ``d``)
+        """
+        if payload.get("op") != 0:
+            return
+
+        event = payload.get("t")
+        if event not in RECORDED_EVENTS:
+            return
+
+        data = payload.get("d") or {}
+        if event == "GUILD_CREATE":
+            data = {k: v for k, v in data.items() if k not in STRIPPED_GUILD_KEYS}
+
+        line = json.dumps([round(time.time(), 3), event, data], separators=(",", ":"))
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line + "\n")
+        self.recorded += 1
+
+        if self.recorded % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        """Flush and close the recording file"""
+        if self._file is not None:
+            self._file.flush()
+            self._file.close()
+            self._file = None
+
+
+def read_recording(path: str):
+    """Yield (timestamp, event, data) tuples from a recording file"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ts, event, data = json.loads(line)
+            except ValueError:
+                # A crash mid-write can leave a truncated last line
+                continue
+            yield ts, event, data
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class EventReplayer:
+    """
+    Replays a recording into the real handlers of a ``commands.Bot`` offline.
+
+    Events go through the bot's own ``ConnectionState`` parsers, so handlers
+    receive the same discord.py objects they would see live. No gateway or
+    REST connection is made.
+
+    Measures:
+        - handler latency: time spent inside each event handler
+        - handler lag: time from when an event *should* have arrived (per
+          the recording and replay speed) until its handler finished
+    DB write lag is reported by the ingest pipeline itself.
+    """
+
+    def __init__(self, bot, speed: float = 1.0, drain=None):
+        """
+        Args:
+            bot: The bot whose handlers should receive the events
+            speed: Replay speed multiplier (1 = real time, 0 = as fast as possible)
+            drain: Optional coroutine function awaited after the last handler,
+                   e.g. to wait for queued DB writes to land
+        """
+        self.bot = bot
+        self.speed = speed
+        self.drain = drain
+        self.handler_latencies = {}
+        self.handler_lag = []
+        self.dispatched = 0
+        self._pending = []
+
+    async def _setup(self):
+        # Initialise the bot's asyncio objects without logging in
+        await self.bot._async_setup_hook()
+        await self.bot.setup_hook()
+        # Never try to chunk members over the (absent) gateway
+        self.bot._connection._chunk_guilds = False
+
+        original_run_event = self.bot._run_event
+        replayer = self
+
+        async def timed_run_event(coro, event_name, *args, **kwargs):
+            started = time.perf_counter()
+            await original_run_event(coro, event_name, *args, **kwargs)
+            finished = time.perf_counter()
+            replayer.handler_latencies.setdefault(event_name, []).append(finished - started)
+            scheduled = getattr(asyncio.current_task(), "replay_due", None)
+            if scheduled is not None:
+                replayer.handler_lag.append(finished - scheduled)
+
+        self.bot._run_event = timed_run_event
+
+    def _tag_new_tasks(self, before, due):
+        # Remember the intended arrival time on handler tasks spawned by a dispatch
+        for task in asyncio.all_tasks() - before:
+            if task.get_name().startswith("discord.py: on_"):
+                task.replay_due = due
+                self._pending.append(task)
+
+    async def replay(self, path: str):
+        """
+        Replay a recording file into the bot's handlers.
+
+        Args:
+            path: Recording produced by ``EventRecorder``
+
+        Returns:
+            dict: Replay report (see ``build_report``)
+        """
+        await self._setup()
+
+        parsers = self.bot._connection.parsers
+        first_ts = None
+        start = time.perf_counter()
+
+        for ts, event, data in read_recording(path):
+            if first_ts is None:
+                first_ts = ts
+
+            due = start
+            if self.speed > 0:
+                due = start + (ts - first_ts) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                due = time.perf_counter()
+
+            parser = parsers.get(event)
+            if parser is None:
+                continue
+
+            before = asyncio.all_tasks()
+            try:
+                parser(data)
+            except Exception as e:
+                print(f"⚠️ Failed to replay {event}: {e}")
+                continue
+
+            if event in HANDLER_EVENTS:
+                self._tag_new_tasks(before, due)
+            self.dispatched += 1
+
+            # Let scheduled handlers run, like the gateway read loop would
+            await asyncio.sleep(0)
+
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self.drain:
+            await self.drain()
+
+        return self.build_report(time.perf_counter() - start)
+
+    def build_report(self, elapsed: float) -> dict:
+        """Summarise latencies collected during replay"""
+        handlers = {}
+        for event_name, values in sorted(self.handler_latencies.items()):
+            handlers[event_name] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "max_ms": max(values) * 1000,
+            }
+
+        return {
+            "events": self.dispatched,
+            "elapsed_s": elapsed,
+            "events_per_s": self.dispatched / elapsed if elapsed > 0 else 0.0,
+            "handlers": handlers,
+            "handler_lag": {
+                "count": len(self.handler_lag),
+                "p50_ms": percentile(self.handler_lag, 50) * 1000,
+                "p95_ms": percentile(self.handler_lag, 95) * 1000,
+                "p99_ms": percentile(self.handler_lag, 99) * 1000,
+                "max_ms": max(self.handler_lag) * 1000 if self.handler_lag else 0.0,
+            },
+        }
+
+
+def print_report(report: dict):
+    """Pretty-print a replay report"""
+    print("=" * 50)
+    print(" REPLAY COMPLETE")
+    print(f"   Events: {report['events']} in {report['elapsed_s']:.2f}s "
+          f"({report['events_per_s']:.1f} events/s)")
+    print("-" * 50)
+    for event_name, stats in report["handlers"].items():
+        print(f"   {event_name:<28} n={stats['count']:<6} "
+              f"p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+    lag = report["handler_lag"]
+    print("-" * 50)
+    print(f"   Handler lag: p50={lag['p50_ms']:.1f}ms p95={lag['p95_ms']:.1f}ms "
+          f"p99={lag['p99_ms']:.1f}ms max={lag['max_ms']:.1f}ms")
+    print("=" * 50)